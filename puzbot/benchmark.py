@@ -0,0 +1,205 @@
+"""
+Solver benchmark suite.
+
+Runs solvers against the known test maps or a generated puzzle corpus. Every
+solve runs in its own process with a timeout, and the results are reported
+as JSON: median/p95 latency, search nodes and peak process memory per solver.
+
+Usage:
+    python -m puzbot.benchmark --corpus maps
+    python -m puzbot.benchmark --rows 8 --columns 8 --prefilled 20 --duplicates 4 \\
+        --constraints 3 --count 20 --timeout 10 --solvers backtracking,z3-pb
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from puzbot.generator import Puzzle, generate_puzzle
+from puzbot.solvers.backtracking import BacktrackingSolver
+from puzbot.solvers.board import is_solution
+from puzbot.solvers.bruteforce import BruteForceSolver
+from puzbot.solvers.z3 import Z3Solver
+
+# Solver name: (class, constructor arguments, empty cell value the solver expects)
+SOLVERS = {
+    'bruteforce': (BruteForceSolver, {'empty_value': -1}, -1),
+    'backtracking': (BacktrackingSolver, {'empty_value': -1}, -1),
+    'z3-int': (Z3Solver, {'encoding': 'int'}, -1),
+    'z3-pb': (Z3Solver, {'encoding': 'pb'}, -1),
+}
+
+# Known Puzlogic maps in the solver input format used by Bot
+MAPS = {
+    'map-1': Puzzle([
+        (0, 1, 1),
+        (1, 0, -1),
+        (1, 1, -1),
+        (2, 0, 2)
+    ], [1, 2], [], None),
+    'map-3': Puzzle([
+        (0, 0, -1),
+        (0, 2, -1),
+        (0, 4, 5),
+        (1, 1, 4),
+        (1, 3, -1),
+        (2, 0, 6),
+        (2, 4, -1),
+        (3, 1, -1),
+        (3, 3, 6),
+        (4, 0, 5),
+        (4, 2, 4),
+        (4, 4, -1),
+    ], [4, 5, 6, 4, 5, 6], [], None),
+    'map-7': Puzzle([
+        (0, 0, 2),
+        (0, 3, -1),
+        (0, 5, -1),
+        (1, 0, -1),
+        (1, 1, 1),
+        (1, 4, 5),
+        (1, 5, -1),
+        (2, 0, 6),
+        (2, 2, 4),
+        (2, 5, -1),
+        (3, 0, -1),
+        (3, 3, 3),
+        (3, 5, 8),
+        (4, 2, -1),
+        (4, 3, -1),
+        (4, 4, 7)
+    ], [1, 2, 3, 4, 5, 6, 7, 8], [
+        (0, 0, 14),
+        (0, 1, 15),
+        (1, 0, 18),
+        (1, 3, 13),
+        (1, 5, 19)
+    ], None),
+}
+
+def generate_corpus(count, seed=0, **parameters):
+    """ Generates `count` puzzles, see generate_puzzle for the parameters """
+    rng = random.Random(seed)
+    return {'generated-%d' % index: generate_puzzle(rng=rng, **parameters) for index in range(count)}
+
+def _solve_in_process(solver_name, puzzle, results):
+    try:
+        (solver_class, arguments, empty_value) = SOLVERS[solver_name]
+        solver = solver_class(**arguments)
+        board = [(row, column, empty_value if value == -1 else value) for (row, column, value) in puzzle.board]
+
+        started_at = time.perf_counter()
+        moves = solver.solve(board, puzzle.pieces, puzzle.constraints)
+        elapsed = time.perf_counter() - started_at
+
+        results.put({
+            'seconds': elapsed,
+            'solved': is_solution(puzzle.board, puzzle.pieces, puzzle.constraints, moves, empty_value=-1),
+            'nodes': getattr(solver, 'nodes', None),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        })
+    except Exception as e:
+        results.put({'error': repr(e)})
+
+def run_once(solver_name, puzzle, timeout):
+    """ Solves the puzzle in a separate process, killing it after `timeout` seconds """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_solve_in_process, args=(solver_name, puzzle, results))
+    process.start()
+    try:
+        return results.get(timeout=timeout)
+    except queue.Empty:
+        return {'timed_out': True}
+    finally:
+        process.terminate()
+        process.join()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def summarize(runs):
+    solved = [run for run in runs if run.get('solved')]
+    seconds = [run['seconds'] for run in solved]
+    nodes = [run['nodes'] for run in solved if run['nodes'] is not None]
+    memory = [run['max_rss_kb'] for run in runs if run.get('max_rss_kb') is not None]
+
+    return {
+        'runs': len(runs),
+        'solved': len(solved),
+        'timed_out': len([run for run in runs if run.get('timed_out')]),
+        'errors': len([run for run in runs if 'error' in run]),
+        'median_ms': statistics.median(seconds) * 1000 if seconds else None,
+        'p95_ms': percentile(seconds, 0.95) * 1000 if seconds else None,
+        'median_nodes': statistics.median(nodes) if nodes else None,
+        'peak_max_rss_kb': max(memory) if memory else None,
+    }
+
+def run_benchmark(solver_names, puzzles, timeout=10, repeat=1):
+    """ Returns a report of every solver against every puzzle """
+    report = {'timeout': timeout, 'repeat': repeat, 'puzzles': len(puzzles), 'solvers': {}}
+
+    for solver_name in solver_names:
+        runs = []
+        for (puzzle_name, puzzle) in sorted(puzzles.items()):
+            for _ in range(repeat):
+                run = run_once(solver_name, puzzle, timeout)
+                run['puzzle'] = puzzle_name
+                runs.append(run)
+
+        report['solvers'][solver_name] = dict(summarize(runs), results=runs)
+
+    return report
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark Puzlogic solvers')
+    parser.add_argument('--solvers', default=','.join(sorted(SOLVERS)), help='Comma separated: %s' % ', '.join(sorted(SOLVERS)))
+    parser.add_argument('--corpus', choices=['maps', 'generated'], default='generated')
+    parser.add_argument('--rows', type=int, default=6)
+    parser.add_argument('--columns', type=int, default=6)
+    parser.add_argument('--prefilled', type=int, default=12)
+    parser.add_argument('--duplicates', type=int, default=0)
+    parser.add_argument('--constraints', type=int, default=2)
+    parser.add_argument('--density', type=float, default=0.8)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    arguments = parser.parse_args(argv)
+
+    if arguments.corpus == 'maps':
+        puzzles = MAPS
+    else:
+        puzzles = generate_corpus(
+            arguments.count,
+            seed=arguments.seed,
+            rows=arguments.rows,
+            columns=arguments.columns,
+            prefilled=arguments.prefilled,
+            duplicates=arguments.duplicates,
+            constraints=arguments.constraints,
+            density=arguments.density,
+        )
+
+    report = run_benchmark(arguments.solvers.split(','), puzzles, arguments.timeout, arguments.repeat)
+    report['corpus'] = vars(arguments)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,29 +1,49 @@
+import time
+
+from puzbot.grid import Grid
+
 class Bot:
-    """ Needs to map vision coordinates to solver coordinates """
+    """ Maps vision pixel coordinates to dense solver coordinates through a Grid """
 
-    def __init__(self, vision, controls, solver):
+    def __init__(self, vision, controls, solver, profiler=None):
+        """
+        With a profiler (a puzbot.profiling.LevelProfiler) every do_moves
+        call, from reading the board to the last mouse move, is profiled as
+        one level.
+        """
         self.vision = vision
         self.controls = controls
         self.solver = solver
+        self.profiler = profiler
+
+    def get_grid(self):
+        """ Dense row/column indices of the cells on the current frame """
+        return Grid(self.vision.get_cells())
 
-    def get_board(self):
+    def get_board(self, grid=None):
         """ Prepares vision cells for solver """
-        cells = self.vision.get_cells()
-        return list(map(lambda c: (c.y, c.x, -1 if c.content == False else c.content), cells))
+        return (grid or self.get_grid()).board()
 
     def get_pieces(self):
         """ Prepares vision pieces for solver """
         return list(map(lambda p: p.content, self.vision.get_pieces()))
 
-    def get_constraints(self):
+    def get_constraints(self, grid=None):
         """ Prepares vision constraints for solver """
-        return self.vision.get_constraints()
+        return (grid or self.get_grid()).constraints(self.vision.get_constraints())
 
-    def get_moves(self):
-        return self.solver.solve(self.get_board(), self.get_pieces(), self.get_constraints())
+    def get_moves(self, grid=None):
+        grid = grid or self.get_grid()
+        return self.solver.solve(self.get_board(grid), self.get_pieces(), self.get_constraints(grid))
 
     def do_moves(self):
-        moves = self.get_moves()
+        if self.profiler is not None:
+            return self.profiler.profile(self._do_moves)
+        return self._do_moves()
+
+    def _do_moves(self):
+        grid = self.get_grid()
+        moves = self.get_moves(grid)
 
         if not moves:
             print('Unable to find a solution')
@@ -37,12 +57,13 @@ class Bot:
             remaining_pieces = list(filter(lambda p: p != target, pieces))
             return (target, remaining_pieces)
 
-        for (to_y, to_x, required_piece) in moves:
+        for (row, column, required_piece) in moves:
             (piece, available_pieces) = get_available_piece(required_piece, available_pieces)
+            cell = grid.cell(row, column)
 
             # Offset of the game screen within a window + offset of the cell + center of the cell
             move_from = (board.x + piece.x + piece.w/2, board.y + piece.y + piece.h/2)
-            move_to = (board.x + to_x + piece.w/2, board.y + to_y + piece.h/2)
+            move_to = (board.x + cell.x + piece.w/2, board.y + cell.y + piece.h/2)
             print('Moving', move_from, move_to)
 
             self.controls.left_mouse_drag(
@@ -53,3 +74,54 @@ class Bot:
     def refresh(self):
         """ Get a new frame """
         self.vision.source.refresh()
+
+    def run(self, pipeline, levels=None, settle_time=1.0, timeout=None):
+        """
+        Keeps solving levels from the snapshots of a started Pipeline.
+
+        Each level is solved from the freshest snapshot, then the bot waits
+        `settle_time` seconds for the game to react and only considers frames
+        captured after that. A puzzle which failed to solve is not retried
+        until something on screen changes. Returns the number of levels
+        solved, after `levels` levels or once no snapshot arrives within
+        `timeout` seconds.
+        """
+        solved = 0
+        after = 0
+        failed_puzzle = None
+        # Levels are solved from snapshots standing in for Vision, the real one is put back afterwards
+        vision = self.vision
+
+        try:
+            while levels is None or solved < levels:
+                snapshot = pipeline.latest(after, timeout)
+                if snapshot is None:
+                    break
+
+                after = snapshot.frame.number
+                if not snapshot.has_puzzle():
+                    continue
+
+                self.vision = snapshot
+                try:
+                    grid = self.get_grid()
+                    puzzle = (sorted(self.get_board(grid)), sorted(self.get_pieces()), sorted(self.get_constraints(grid)))
+                except ValueError as error:
+                    # Misdetected frames, e.g. mid-animation, are skipped like VisionWorker skips unreadable ones
+                    print('Skipping frame %d: %s' % (snapshot.frame.number, error))
+                    continue
+                if puzzle == failed_puzzle:
+                    continue
+
+                if self.do_moves() is False:
+                    failed_puzzle = puzzle
+                    continue
+
+                failed_puzzle = None
+                solved += 1
+                time.sleep(settle_time)
+                after = pipeline.frame_count()
+        finally:
+            self.vision = vision
+
+        return solved
@@ -0,0 +1,73 @@
+import collections
+import json
+import os
+import threading
+
+class PersistentCache:
+    """
+    Least recently used key-value store, optionally persisted to a JSON file.
+
+    Keys are strings and values anything JSON serializable. At most
+    `max_entries` entries are kept, the least recently used ones are evicted
+    first. Without a path the cache lives in memory only. With `autosave`
+    disabled entries are written only when save is called, for callers that
+    put many entries at once. Entries can be read and written from several
+    threads.
+    """
+
+    def __init__(self, path=None, max_entries=1000, autosave=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.autosave = autosave
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries.update(json.load(f))
+            self._evict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self._evict()
+            if self.autosave:
+                self.save()
+
+    def save(self):
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so a crash can't leave a truncated cache behind
+        temporary_path = self.path + '.tmp'
+        with self.lock:
+            with open(temporary_path, 'w') as f:
+                json.dump(list(self.entries.items()), f)
+            os.replace(temporary_path, self.path)
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -0,0 +1,74 @@
+"""
+Debug overlays of what Vision recognized.
+
+Vision only hands its results to an overlay when one is given, so the
+regular path never copies or draws on frames. The overlay collects labelled
+rectangles per frame and draws them on a copy of the board once the frame
+is done, optionally writing the annotated frames to a directory.
+
+    vision = Vision(source, templates_path='templates/', debug=DebugOverlay('debug/'))
+"""
+import os
+
+import cv2
+
+class DebugOverlay:
+    """
+    Annotated copies of the frames Vision worked on.
+
+    Annotations are kept per kind (e.g. 'cells', 'target sums'), so a kind
+    recognized again on the same frame replaces its earlier annotations.
+    Frames are numbered in the order they are finished. With a directory
+    every finished frame is written there as NNNNN.png, the last one is
+    always available as `image`.
+    """
+
+    COLORS = {
+        'cells': (0, 0, 255),
+        'indicators': (255, 0, 0),
+        'target sums': (0, 165, 255),
+    }
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.frames = 0
+        self.board = None
+        self.annotations = {}
+        self.image = None
+
+    def start(self, board):
+        """ Begins annotating a new board, finishing the frame before it """
+        if self.board is not None:
+            self.finish()
+        self.board = board
+
+    def annotate(self, kind, rectangles):
+        """ Marks (x, y, width, height, label) rectangles in board coordinates, label may be None """
+        self.annotations[kind] = list(rectangles)
+
+    def render(self):
+        """ Copy of the current board screen with all annotations drawn on it """
+        image = self.board.screen.copy()
+        for (kind, rectangles) in self.annotations.items():
+            color = self.COLORS.get(kind, (255, 0, 255))
+            for (x, y, width, height, label) in rectangles:
+                cv2.rectangle(image, (int(x), int(y)), (int(x + width), int(y + height)), color, 2)
+                if label is not None:
+                    cv2.putText(image, str(label), (int(x), int(y) - 3), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        return image
+
+    def finish(self):
+        """ Draws the current frame and writes it out, returns the annotated image or None without a board """
+        if self.board is None:
+            return None
+
+        self.image = self.render()
+        self.frames += 1
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            cv2.imwrite(os.path.join(self.directory, '%05d.png' % self.frames), self.image)
+
+        self.board = None
+        self.annotations = {}
+        return self.image
@@ -0,0 +1,245 @@
+"""
+Template matching digit classifier.
+
+Puzlogic renders every number in the same font, so instead of running
+Tesseract on every tile, glyphs are compared against a small bank of
+reference glyphs learned from labelled screenshots. Each glyph is cropped to
+its ink, padded to a square, scaled down and normalized to zero mean and unit
+length, so a single matrix product scores every glyph against every template
+at once. Labels of the screenshots are kept in templates/digits.json.
+
+The bank only knows the digits seen in the labelled screenshots. There are
+no tile 9 and no target sum 7 among them, so those glyphs never match
+confidently and are left to Tesseract.
+
+Usage:
+    python -m puzbot.digits --output templates/digits.npz tests/screenshots/*.png
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import cv2
+import numpy as np
+
+class DigitClassifier:
+    """
+    Reads numbers from black-on-white images, as prepared for Tesseract by
+    Vision. Every result comes with a confidence, the lowest correlation of
+    its glyphs with the best matching templates, so callers can fall back to
+    Tesseract for images the templates do not explain.
+    """
+
+    def __init__(self, templates=None, labels=None, size=16, threshold=0.85):
+        self.size = size
+        self.threshold = threshold
+        self.templates = np.zeros((0, size * size), dtype=np.float32) if templates is None else np.asarray(templates, dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+
+    @classmethod
+    def load(cls, path, threshold=0.85):
+        bank = np.load(path)
+        return cls(bank['templates'], bank['labels'], int(bank['size']), threshold)
+
+    def save(self, path):
+        np.savez_compressed(path, templates=self.templates, labels=self.labels, size=self.size)
+
+    def glyphs(self, image):
+        """
+        Ink crops of the characters within the image, left to right.
+
+        Specks and blobs touching the image edge are ignored, as they come
+        from tile borders and background decorations rather than digits.
+        """
+        ink = (image < 128).astype(np.uint8)
+        (height, width) = ink.shape
+        (count, components, stats, _) = cv2.connectedComponentsWithStats(ink)
+
+        glyphs = []
+        for component in range(1, count):
+            (x, y, w, h, area) = stats[component]
+            if x == 0 or y == 0 or x + w == width or y + h == height:
+                continue
+            if h < height / 4:
+                continue
+            glyph = components[y:y+h, x:x+w] == component
+            glyphs += [(x + left, part) for (left, part) in self.split(glyph)]
+
+        return [glyph for (_, glyph) in sorted(glyphs, key=lambda g: g[0])]
+
+    def split(self, glyph, max_aspect=0.9, digit_aspect=0.75):
+        """
+        Splits blobs too wide to be a single digit, as blurred neighbouring
+        digits merge. The number of digits is estimated from the blob width,
+        and each cut goes through the column with the least ink close to
+        where an evenly spaced cut would be. Returns (x offset, glyph) pairs.
+        """
+        (height, width) = glyph.shape
+        if width <= height * max_aspect:
+            return [(0, glyph)]
+
+        count = max(2, int(round(width / (height * digit_aspect))))
+        ink = glyph.sum(axis=0)
+        margin = max(1, width // (6 * count))
+        cuts = [0]
+        for part in range(1, count):
+            middle = part * width // count
+            cuts.append(middle - margin + int(np.argmin(ink[middle - margin:middle + margin + 1])))
+        cuts.append(width)
+
+        parts = []
+        for (left, right) in zip(cuts, cuts[1:]):
+            part = glyph[:, left:right]
+            rows = np.flatnonzero(part.any(axis=1))
+            columns = np.flatnonzero(part.any(axis=0))
+            if len(rows):
+                parts.append((left + columns[0], part[rows[0]:rows[-1]+1, columns[0]:columns[-1]+1]))
+
+        return parts
+
+    def normalize(self, glyph):
+        """ Flat zero mean, unit length vector of the glyph centered in a square """
+        (height, width) = glyph.shape
+        side = max(height, width)
+        square = np.zeros((side, side), dtype=np.float32)
+        top = (side - height) // 2
+        left = (side - width) // 2
+        square[top:top+height, left:left+width] = glyph
+
+        vector = cv2.resize(square, (self.size, self.size), interpolation=cv2.INTER_AREA).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def learn(self, images, numbers):
+        """ Adds the average glyph of every digit found in the labelled images to the bank """
+        samples = {}
+        for (image, number) in zip(images, numbers):
+            glyphs = self.glyphs(image)
+            # Target sums are rendered with a leading zero, e.g. 04
+            digits = str(number).zfill(len(glyphs))
+            if len(glyphs) != len(digits):
+                continue
+            for (glyph, digit) in zip(glyphs, digits):
+                samples.setdefault(int(digit), []).append(self.normalize(glyph))
+
+        for (digit, vectors) in sorted(samples.items()):
+            template = np.mean(vectors, axis=0)
+            template /= np.linalg.norm(template)
+            self.templates = np.vstack([self.templates, template[np.newaxis].astype(np.float32)])
+            self.labels = np.append(self.labels, digit)
+
+    def classify(self, glyphs):
+        """ (digits, scores) arrays for the glyphs, scoring all of them against all templates at once """
+        if not glyphs or not len(self.templates):
+            return (np.zeros(len(glyphs), dtype=np.int64), np.zeros(len(glyphs), dtype=np.float32))
+
+        vectors = np.stack([self.normalize(glyph) for glyph in glyphs])
+        scores = vectors @ self.templates.T
+        best = scores.argmax(axis=1)
+
+        return (self.labels[best], scores[np.arange(len(glyphs)), best])
+
+    def read(self, image):
+        return self.read_all([image])[0]
+
+    def read_all(self, images):
+        """
+        (number, confidence) for every image. Images without any glyphs are
+        empty tiles, read as (False, 1.0).
+        """
+        glyphs = [self.glyphs(image) for image in images]
+        (digits, scores) = self.classify([glyph for image_glyphs in glyphs for glyph in image_glyphs])
+
+        results = []
+        offset = 0
+        for image_glyphs in glyphs:
+            if not image_glyphs:
+                results.append((False, 1.0))
+                continue
+
+            end = offset + len(image_glyphs)
+            number = int(''.join(str(digit) for digit in digits[offset:end]))
+            results.append((number, float(scores[offset:end].min())))
+            offset = end
+
+        return results
+
+    def is_confident(self, confidence):
+        return confidence >= self.threshold
+
+def load_labels(path):
+    """
+    Hand checked labels of screenshots, keyed by file name. Tiles are
+    labelled by their [x, y, number] and target sums by their
+    [dimension, index, target sum] on the game board, as Vision finds them.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+def build(paths, labels_path='templates/digits.json', templates_path='templates/', size=16):
+    """
+    Learns a template bank from screenshots.
+
+    Target sum crops named like constraint_cell_13.png are labelled by their
+    file name, tiles and target sums of full game screenshots by the labels
+    file. Screenshots without labels are skipped, so the bank never learns
+    from misreads.
+    """
+    from puzbot.vision import ImageFileSource, Vision
+
+    labels = load_labels(labels_path)
+    classifier = DigitClassifier(size=size)
+    tiles = ([], [])
+    target_sums = ([], [])
+
+    for path in paths:
+        source = ImageFileSource(path)
+        vision = Vision(source, templates_path=templates_path)
+        labelled = re.search(r'constraint_cell_(\d+)', os.path.basename(path))
+
+        if labelled:
+            target_sums[0].append(vision._prepare_target_sum_image(source.get()))
+            target_sums[1].append(int(labelled.group(1)))
+            continue
+
+        screenshot_labels = labels.get(os.path.basename(path))
+        board = vision.get_game_board()
+        if screenshot_labels is None or board is False:
+            continue
+
+        tile_labels = {(x, y): number for (x, y, number) in screenshot_labels['tiles']}
+        for (x, y, w, h) in vision.get_tile_boxes():
+            if (x, y) in tile_labels:
+                tiles[0].append(vision._prepare_number_image(board.screen[y:y+h, x:x+w]))
+                tiles[1].append(tile_labels[(x, y)])
+
+        target_sum_labels = {(dimension, index): target_sum for (dimension, index, target_sum) in screenshot_labels['target_sums']}
+        for (dimension, index, x, y, w, h) in vision.get_target_sum_regions():
+            if (dimension, index) in target_sum_labels:
+                target_sums[0].append(vision._prepare_target_sum_image(board.screen[y:y+h, x:x+w]))
+                target_sums[1].append(target_sum_labels[(dimension, index)])
+
+    # Tiles and target sums are rendered in different sizes and weights, keep templates for both
+    classifier.learn(*tiles)
+    classifier.learn(*target_sums)
+
+    return classifier
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Build the digit template bank')
+    parser.add_argument('screenshots', nargs='+')
+    parser.add_argument('--output', default='templates/digits.npz')
+    parser.add_argument('--labels', default='templates/digits.json', help='Labels of tiles and target sums per screenshot')
+    parser.add_argument('--templates', default='templates/', help='Directory with target-sum-indicator.png')
+    parser.add_argument('--size', type=int, default=16)
+    arguments = parser.parse_args(argv)
+
+    classifier = build(arguments.screenshots, arguments.labels, arguments.templates, arguments.size)
+    classifier.save(arguments.output)
+    print('Learned %d templates for digits %s' % (len(classifier.labels), sorted(set(classifier.labels.tolist()))))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+import collections
+import random
+
+Puzzle = collections.namedtuple('Puzzle', ['board', 'pieces', 'constraints', 'solution'])
+
+def generate_puzzle(rows, columns, prefilled, duplicates=0, constraints=0, density=1.0, rng=random, empty_value=-1):
+    """
+    Generates a solvable puzzle in the solver input format.
+
+    The solution is a window of a shuffled latin square with values
+    1..max(rows, columns), of which a `density` fraction of positions are
+    board cells. `prefilled` cells keep their value, the rest become pieces,
+    chosen so that at least `duplicates` pieces repeat a value where the board
+    allows it. `constraints` rows/columns with free cells get their solution
+    sum as a target sum.
+    """
+    size = max(rows, columns)
+    row_order = rng.sample(range(size), size)
+    column_order = rng.sample(range(size), size)
+    symbols = rng.sample(range(1, size + 1), size)
+    value_at = lambda row, column: symbols[(row_order[row] + column_order[column]) % size]
+
+    positions = [(row, column) for row in range(rows) for column in range(columns) if rng.random() < density]
+    if not 0 <= prefilled < len(positions):
+        raise ValueError('Cannot prefill %d of %d cells' % (prefilled, len(positions)))
+
+    free = set(rng.sample(positions, len(positions) - prefilled))
+    _add_duplicates(free, positions, value_at, duplicates, rng)
+
+    board = [(row, column, empty_value if (row, column) in free else value_at(row, column)) for (row, column) in positions]
+    solution = [(row, column, value_at(row, column)) for (row, column) in positions if (row, column) in free]
+    pieces = [value for (_, _, value) in solution]
+    rng.shuffle(pieces)
+
+    lines = sorted(set((dimension, cell[dimension]) for cell in free for dimension in (0, 1)))
+    sum_constraints = [
+        (dimension, index, sum(value_at(row, column) for (row, column) in positions if (row, column)[dimension] == index))
+        for (dimension, index) in rng.sample(lines, min(constraints, len(lines)))
+    ]
+
+    return Puzzle(board, pieces, sum_constraints, solution)
+
+def _add_duplicates(free, positions, value_at, duplicates, rng):
+    """
+    Swaps free cells with a unique value for prefilled cells repeating another
+    free value, until there are enough duplicate pieces or no swap is left.
+    """
+    while len(free) - len(set(value_at(*cell) for cell in free)) < duplicates:
+        counts = collections.Counter(value_at(*cell) for cell in free)
+        swaps = [
+            (free_cell, prefilled_cell)
+                for free_cell in sorted(free) if counts[value_at(*free_cell)] == 1
+                for prefilled_cell in positions if prefilled_cell not in free
+                if counts[value_at(*prefilled_cell)] > 0 and value_at(*prefilled_cell) != value_at(*free_cell)
+        ]
+        if not swaps:
+            return
+
+        (free_cell, prefilled_cell) = rng.choice(swaps)
+        free.remove(free_cell)
+        free.add(prefilled_cell)
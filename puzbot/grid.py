@@ -0,0 +1,83 @@
+"""
+Grid model between Vision pixel coordinates and solver coordinates.
+
+Vision reports cells and target sums by their pixel offsets on the game
+board, which are sparse, large and off by a pixel or two between frames.
+Solvers only care which cells share a row or a column, so the Grid clusters
+pixel positions into dense row and column indices starting from 0, and
+remembers where each cell is so solutions can be turned back into moves.
+"""
+
+def cluster(positions, tolerance):
+    """
+    Groups sorted pixel positions lying within `tolerance` of their
+    neighbour, returning the mean position of every group in order
+    """
+    lines = []
+    for position in sorted(positions):
+        if lines and position - lines[-1][-1] <= tolerance:
+            lines[-1].append(position)
+        else:
+            lines.append([position])
+
+    return [sum(line) / len(line) for line in lines]
+
+class Grid:
+    """
+    Dense row/column indices of a board, built from Vision cells.
+
+    Target sum constraints are matched to the nearest row or column within
+    the tolerance, constraints which match no line of cells are dropped.
+    Cells sharing a grid position and lines with different target sums are
+    misdetections, which raise a ValueError rather than become a wrong puzzle.
+    """
+
+    def __init__(self, cells, tolerance=12):
+        self.tolerance = tolerance
+        self.rows = cluster([cell.y for cell in cells], tolerance)
+        self.columns = cluster([cell.x for cell in cells], tolerance)
+        self.cells = {}
+        for cell in cells:
+            position = (self.row(cell.y), self.column(cell.x))
+            if position in self.cells:
+                raise ValueError('Cells %s and %s share grid position %s' % (self.cells[position], cell, position))
+            self.cells[position] = cell
+
+    def _nearest(self, lines, position):
+        if not lines:
+            return None
+
+        index = min(range(len(lines)), key=lambda i: abs(lines[i] - position))
+        return index if abs(lines[index] - position) <= self.tolerance else None
+
+    def row(self, y):
+        """ Row index of a pixel y offset, None if there is no row there """
+        return self._nearest(self.rows, y)
+
+    def column(self, x):
+        """ Column index of a pixel x offset, None if there is no column there """
+        return self._nearest(self.columns, x)
+
+    def board(self, empty_value=-1):
+        """ Cells in solver (row, column, value) format """
+        return [
+            (row, column, empty_value if cell.content is False else cell.content)
+            for ((row, column), cell) in self.cells.items()
+        ]
+
+    def constraints(self, constraints):
+        """ Maps Vision (dimension, pixel index, target sum) constraints to grid lines """
+        mapped = {}
+        for (dimension, index, target_sum) in constraints:
+            line = self.row(index) if dimension == 0 else self.column(index)
+            if line is None:
+                continue
+            if mapped.get((dimension, line), target_sum) != target_sum:
+                raise ValueError('Target sums %s and %s both match %s %d' % (mapped[(dimension, line)], target_sum, 'row' if dimension == 0 else 'column', line))
+            mapped[(dimension, line)] = target_sum
+
+        return [(dimension, line, target_sum) for ((dimension, line), target_sum) in mapped.items()]
+
+    def cell(self, row, column):
+        """ The Vision cell at grid position (row, column) """
+        return self.cells[(row, column)]
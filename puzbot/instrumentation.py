@@ -0,0 +1,189 @@
+"""
+Latency instrumentation of the bot loop.
+
+A Tracer times spans around methods of Vision, the solver and the mouse
+controller, and counts OCR runs and cache hits. Every span is written as a
+JSON line, and each level solved adds a summary line with time spent per
+span name and the counters of that level:
+
+    {"type": "span", "name": "vision.get_constraints", "duration": 0.012, ...}
+    {"type": "level", "level": 1, "duration": 2.4, "spans": {...}, "counters": {...}}
+
+    tracer = Tracer('trace.jsonl')
+    instrument_bot(bot, tracer)
+"""
+import collections
+import contextlib
+import functools
+import json
+import threading
+import time
+
+VISION_METHODS = [
+    'refresh',
+    'get_game_board',
+    'get_board_thumbnail',
+    'get_tile_boxes',
+    'get_visible_cells',
+    'get_cells',
+    'get_pieces',
+    'get_constraints',
+    'get_indicator_area',
+    'get_target_sum_indicators',
+    'get_target_sum_regions',
+]
+
+# Vision methods running Tesseract, each call counts as an OCR run
+OCR_METHODS = ['_tesseract_number', '_tesseract_target_sum', '_recognize_batch']
+
+class Tracer:
+    """
+    Collects timing spans and counters, thread safe. Spans nest per thread,
+    each records the span it ran within as its parent.
+
+    Gauges are functions returning cumulative numbers, like cache hit
+    counts. Level summaries report how much they grew during the level.
+    """
+
+    def __init__(self, path=None, clock=time.perf_counter):
+        self.path = path
+        self.clock = clock
+        self.file = open(path, 'a') if path else None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.levels = 0
+        self.summaries = []
+        self.gauges = {}
+        self._start_level()
+
+    def _start_level(self):
+        self.level_started_at = self.clock()
+        self.durations = collections.defaultdict(list)
+        self.counters = collections.Counter()
+        self.gauge_baselines = {name: read() for (name, read) in self.gauges.items()}
+
+    @contextlib.contextmanager
+    def span(self, name):
+        stack = self.local.__dict__.setdefault('stack', [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        started_at = self.clock()
+        try:
+            yield
+        finally:
+            duration = self.clock() - started_at
+            stack.pop()
+            with self.lock:
+                self.durations[name].append(duration)
+                self._write({
+                    'type': 'span',
+                    'name': name,
+                    'parent': parent,
+                    'thread': threading.current_thread().name,
+                    'start': started_at,
+                    'duration': duration,
+                })
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def gauge(self, name, read):
+        with self.lock:
+            self.gauges[name] = read
+            self.gauge_baselines[name] = read()
+
+    def wrap(self, name, func, counter=None):
+        """ The function timed as a span, counting its calls under `counter` if given """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if counter:
+                self.count(counter)
+            with self.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def instrument(self, obj, methods, prefix, counter=None):
+        """ Replaces the methods of an object with timed ones, named prefix.method """
+        for method in methods:
+            if hasattr(obj, method):
+                setattr(obj, method, self.wrap('%s.%s' % (prefix, method), getattr(obj, method), counter))
+
+    def finish_level(self):
+        """ Writes and returns the summary of the level so far, and starts the next one """
+        with self.lock:
+            self.levels += 1
+            counters = dict(self.counters)
+            for (name, read) in self.gauges.items():
+                counters[name] = read() - self.gauge_baselines[name]
+
+            summary = {
+                'type': 'level',
+                'level': self.levels,
+                'duration': self.clock() - self.level_started_at,
+                'spans': {
+                    name: {'count': len(durations), 'total': sum(durations), 'max': max(durations)}
+                    for (name, durations) in sorted(self.durations.items())
+                },
+                'counters': counters,
+            }
+            self.summaries.append(summary)
+            self._write(summary)
+            if self.file:
+                self.file.flush()
+
+            self._start_level()
+
+        return summary
+
+    def _write(self, record):
+        if self.file:
+            self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def instrument_bot(bot, tracer):
+    """
+    Times the Vision, capture source, solver and controller of a Bot, counts
+    OCR runs and OCR/solution cache hits, and ends a level after every
+    do_moves call.
+    """
+    vision = bot.vision
+    tracer.instrument(vision, VISION_METHODS, 'vision')
+    tracer.instrument(vision, OCR_METHODS, 'ocr', counter='ocr.calls')
+    tracer.instrument(vision.source, ['refresh', 'capture'], 'capture')
+    tracer.instrument(bot.solver, ['solve'], 'solver')
+    tracer.instrument(bot.controls, ['left_mouse_drag'], 'controls')
+
+    if getattr(vision, 'ocr_cache', None) is not None:
+        tracer.gauge('ocr_cache.hits', lambda: vision.ocr_cache.hits)
+        tracer.gauge('ocr_cache.misses', lambda: vision.ocr_cache.misses)
+    solution_cache = getattr(bot.solver, 'cache', None)
+    if solution_cache is not None and hasattr(solution_cache, 'hits'):
+        tracer.gauge('solution_cache.hits', lambda: solution_cache.hits)
+        tracer.gauge('solution_cache.misses', lambda: solution_cache.misses)
+
+    do_moves = tracer.wrap('bot.do_moves', bot.do_moves)
+    def do_moves_level():
+        try:
+            return do_moves()
+        finally:
+            tracer.finish_level()
+    bot.do_moves = functools.wraps(do_moves)(do_moves_level)
+
+    return tracer
+
+def format_summary(summary):
+    """ Human readable level summary, slowest spans first """
+    lines = ['Level %d took %.3fs' % (summary['level'], summary['duration'])]
+    spans = sorted(summary['spans'].items(), key=lambda item: -item[1]['total'])
+    for (name, span) in spans:
+        lines.append('  %-36s %5d calls %9.1fms total %9.1fms max' % (name, span['count'], span['total'] * 1000, span['max'] * 1000))
+    for (name, value) in sorted(summary['counters'].items()):
+        lines.append('  %-36s %5d' % (name, value))
+
+    return '\n'.join(lines)
@@ -0,0 +1,239 @@
+"""
+Threaded capture and vision pipeline.
+
+A capture thread keeps grabbing frames from a source into a small ring
+buffer, and a vision worker keeps turning the newest frame into a Snapshot
+of the recognized board. Frames the worker has no time for are dropped, so
+consumers always get the freshest processed state without waiting for a
+screen capture themselves.
+
+    pipeline = Pipeline(Vision(ScreenshotSource(), templates_path='templates/'))
+    pipeline.start()
+    snapshot = pipeline.latest()
+"""
+import collections
+import threading
+import time
+
+Frame = collections.namedtuple('Frame', ['number', 'timestamp', 'image', 'origin'])
+
+class FrameBuffer:
+    """ Ring buffer of the latest frames, numbered in capture order starting from 1 """
+
+    def __init__(self, size=3):
+        self.frames = collections.deque(maxlen=size)
+        self.condition = threading.Condition()
+        self.count = 0
+
+    def put(self, image, origin=(0, 0)):
+        with self.condition:
+            self.count += 1
+            self.frames.append(Frame(self.count, time.monotonic(), image, origin))
+            self.condition.notify_all()
+
+    def wait(self, after=0, timeout=None):
+        """ Waits until a frame newer than frame number `after` is captured """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.count > after, timeout)
+
+    def latest(self, after=0, timeout=None):
+        """ Newest frame once there is one newer than `after`, None on timeout """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.count > after, timeout):
+                return None
+            return self.frames[-1]
+
+class CaptureThread(threading.Thread):
+    """
+    Grabs frames from the source into the buffer, every `interval` seconds
+    at most. Failed captures are counted in `errors` and the last one kept
+    as `error`, capturing is retried after `retry_interval` seconds.
+    """
+
+    def __init__(self, source, frames, interval=0.0, retry_interval=0.1):
+        super().__init__(name='capture', daemon=True)
+        self.source = source
+        self.frames = frames
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.stopped = threading.Event()
+        self.errors = 0
+        self.error = None
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                (image, origin) = self.source.capture()
+            except Exception as error:
+                # E.g. the screen is locked, keep trying rather than silently stopping
+                self.errors += 1
+                self.error = error
+                self.stopped.wait(max(self.interval, self.retry_interval))
+                continue
+
+            self.frames.put(image, origin)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+
+class BufferedSource:
+    """
+    Vision source reading frames captured by a CaptureThread.
+
+    Refreshing moves on to the newest buffered frame. Focusing is passed on
+    to the captured source, taking effect on frames captured afterwards.
+    """
+
+    def __init__(self, frames, source, timeout=1.0):
+        self.frames = frames
+        self.source = source
+        self.timeout = timeout
+        self.frame = None
+
+    @property
+    def origin(self):
+        return self.frame.origin
+
+    def get(self):
+        if self.frame is None:
+            self.refresh()
+
+        return self.frame.image
+
+    def refresh(self):
+        """ Waits up to `timeout` seconds for a newer frame, keeping the current one otherwise """
+        frame = self.frames.latest(self.frame.number if self.frame else 0, self.timeout)
+        if frame is not None:
+            self.frame = frame
+
+        return self.get() if self.frame else None
+
+    def focus(self, x, y, width, height):
+        if hasattr(self.source, 'focus'):
+            self.source.focus(x, y, width, height)
+
+    def unfocus(self):
+        if hasattr(self.source, 'unfocus'):
+            self.source.unfocus()
+
+class Snapshot:
+    """
+    Everything Vision recognized on a single frame, behind the same methods
+    Vision offers Bot, so a Bot can work from it directly.
+    """
+
+    def __init__(self, frame, board, cells=[], pieces=[], constraints=[]):
+        self.frame = frame
+        self.board = board
+        self.cells = cells
+        self.pieces = pieces
+        self.constraints = constraints
+
+    @classmethod
+    def from_vision(cls, frame, vision):
+        board = vision.get_game_board()
+        if not board:
+            return cls(frame, board)
+
+        cells = vision.get_visible_cells()
+        if not cells:
+            return cls(frame, board)
+
+        return cls(frame, board, vision.get_cells(), vision.get_pieces(), vision.get_constraints())
+
+    def get_game_board(self):
+        return self.board
+
+    def get_cells(self):
+        return self.cells
+
+    def get_pieces(self):
+        return self.pieces
+
+    def get_constraints(self):
+        return self.constraints
+
+    def has_puzzle(self):
+        """ Does the frame show a level with pieces left to place """
+        return bool(self.board and self.cells and self.pieces)
+
+class VisionWorker(threading.Thread):
+    """ Runs Vision on the newest buffered frame whenever there is one, publishing Snapshots """
+
+    def __init__(self, vision):
+        super().__init__(name='vision', daemon=True)
+        self.vision = vision
+        self.stopped = threading.Event()
+        self.condition = threading.Condition()
+        self.snapshot = None
+        self.errors = 0
+
+    def run(self):
+        source = self.vision.source
+        while not self.stopped.is_set():
+            if not source.frames.wait(source.frame.number if source.frame else 0, timeout=0.1):
+                continue
+
+            self.vision.refresh()
+            # Recognition may move the source on to a newer frame, e.g. when the board is searched for again
+            frame = source.frame
+            try:
+                snapshot = Snapshot.from_vision(frame, self.vision)
+            except Exception:
+                # Mid-animation frames can trip up recognition, the next one will do
+                self.errors += 1
+                continue
+
+            with self.condition:
+                self.snapshot = snapshot
+                self.condition.notify_all()
+
+    def latest(self, after=0, timeout=None):
+        """ Newest snapshot of a frame newer than frame number `after`, None on timeout """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.snapshot is not None and self.snapshot.frame.number > after, timeout):
+                return None
+            return self.snapshot
+
+    def stop(self):
+        self.stopped.set()
+
+class Pipeline:
+    """
+    Capture thread and vision worker around a Vision. The Vision's source
+    is captured in the background, Vision itself is only used by the worker.
+    """
+
+    def __init__(self, vision, buffer_size=3, capture_interval=0.0):
+        self.frames = FrameBuffer(buffer_size)
+        self.capture = CaptureThread(vision.source, self.frames, capture_interval)
+        vision.source = BufferedSource(self.frames, vision.source)
+        self.worker = VisionWorker(vision)
+
+    def start(self):
+        self.capture.start()
+        self.worker.start()
+        return self
+
+    def stop(self):
+        self.capture.stop()
+        self.worker.stop()
+        self.capture.join()
+        self.worker.join()
+
+    def frame_count(self):
+        """ Number of frames captured so far """
+        return self.frames.count
+
+    def latest(self, after=0, timeout=None):
+        """
+        Newest snapshot of a frame newer than `after`. On timeout the last
+        capture error is raised if nothing was captured since, None returned
+        otherwise.
+        """
+        count = self.frames.count
+        snapshot = self.worker.latest(after, timeout)
+        if snapshot is None and self.capture.error is not None and self.frames.count == count:
+            raise self.capture.error
+        return snapshot
@@ -0,0 +1,253 @@
+"""
+Profiling of bot levels.
+
+A LevelProfiler passed to Bot profiles every do_moves call, from reading
+the board through solving to the mouse moves, and writes one profile per
+level. Profiles are either cProfile stats (level-001.prof, for pstats or
+snakeviz) or sampled call stacks in collapsed format (level-001.folded, for
+flamegraph.pl or speedscope). All levels are aggregated as well.
+
+Running this module replays screenshots through a Bot with a controller
+that does not move the mouse, and prints the functions taking most time:
+
+    python -m puzbot.profiling --output profiles/ tests/screenshots/puzlogic-*.png
+    python -m puzbot.profiling --solver bruteforce tests/screenshots/puzlogic-map-[1237].png
+    python -m puzbot.profiling --mode sampling --workers 4 --focus "_solve|can_place|_recognize_number" tests/screenshots/*.png
+
+Only sampling profiles the recognition worker threads, see LevelProfiler.
+"""
+import argparse
+import collections
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    """
+    Samples call stacks every `interval` seconds from a background thread.
+    Costs next to nothing in the profiled threads, at the price of missing
+    calls shorter than the interval.
+
+    Samples the given thread (the calling one by default) and every thread
+    whose name starts with one of `thread_prefixes`, like the Vision
+    'recognition' workers. Stacks are rooted at the thread name, without the
+    number thread pools append to it, so all workers of a pool add up.
+    Samples of those threads waiting for work are left out.
+    """
+
+    # Innermost frames of threads idling in a pool or waiting on a condition
+    IDLE_FILES = ('threading.py', 'thread.py', 'queue.py')
+
+    def __init__(self, interval=0.001, thread=None, thread_prefixes=()):
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+
+    def _threads(self):
+        """ Names of the sampled threads by their ids, threads come and go between samples """
+        return {
+            thread.ident: re.sub(r'_\d+$', '', thread.name)
+            for thread in threading.enumerate()
+            if thread.ident == self.thread_id or (self.thread_prefixes and thread.name.startswith(self.thread_prefixes))
+        }
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for (thread_id, name) in self._threads().items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                if thread_id != self.thread_id and stack and stack[0].split(':')[0] in self.IDLE_FILES:
+                    continue
+                if stack:
+                    stack.append(name)
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """ Stacks in the collapsed 'outermost;...;innermost count' format of flame graph tools """
+        return ''.join('%s %d\n' % (stack, count) for (stack, count) in sorted(self.stacks.items()))
+
+class LevelProfiler:
+    """
+    Profiles calls as levels with cProfile (mode='cprofile') or the
+    SamplingProfiler (mode='sampling'), writing each level's profile to the
+    directory if there is one. `stats` and `stacks` aggregate all levels.
+
+    cProfile only sees the calling thread, so recognition on Vision workers
+    or in a Pipeline's vision worker is missing from its profiles. Sampling
+    covers the threads named with one of `thread_prefixes` as well.
+    """
+
+    MODES = ('cprofile', 'sampling')
+    THREAD_PREFIXES = ('recognition', 'vision')
+
+    def __init__(self, directory=None, mode='cprofile', interval=0.001, thread_prefixes=THREAD_PREFIXES):
+        if mode not in self.MODES:
+            raise ValueError('Unknown profiling mode: %s' % mode)
+
+        self.directory = directory
+        self.mode = mode
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self.levels = 0
+        self.stats = None
+        self.stacks = collections.Counter()
+
+    def profile(self, func, *args, **kwargs):
+        self.levels += 1
+        if self.mode == 'sampling':
+            sampler = SamplingProfiler(self.interval, thread_prefixes=self.thread_prefixes).start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sampler.stop()
+                self.stacks.update(sampler.stacks)
+                self._write('level-%03d.folded' % self.levels, sampler.collapsed())
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            profile.create_stats()
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                profile.dump_stats(os.path.join(self.directory, 'level-%03d.prof' % self.levels))
+
+    def _write(self, name, contents):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write(contents)
+
+    def save(self):
+        """ Writes the profile aggregated over all levels, as all.prof or all.folded """
+        if self.stats is not None and self.directory:
+            self.stats.dump_stats(os.path.join(self.directory, 'all.prof'))
+        if self.stacks:
+            self._write('all.folded', ''.join('%s %d\n' % (stack, count) for (stack, count) in sorted(self.stacks.items())))
+
+    def report(self, limit=25, focus=None):
+        """ Text report of the functions taking most time over all levels, optionally only those matching the focus regex """
+        if self.mode == 'sampling':
+            # Samples in which a function is anywhere on the stack, and on top of it
+            total = collections.Counter()
+            own = collections.Counter()
+            for (stack, count) in self.stacks.items():
+                functions = stack.split(';')
+                own[functions[-1]] += count
+                for function in set(functions):
+                    total[function] += count
+
+            samples = sum(self.stacks.values())
+            names = [name for (name, _) in total.most_common() if focus is None or re.search(focus, name)]
+            lines = ['%d samples every %.1fms' % (samples, self.interval * 1000), '%8s %8s  function' % ('total', 'own')]
+            lines += ['%7.1f%% %7.1f%%  %s' % (100.0 * total[name] / samples, 100.0 * own[name] / samples, name) for name in names[:limit]]
+            return '\n'.join(lines) + '\n'
+
+        output = io.StringIO()
+        if self.stats is not None:
+            self.stats.stream = output
+            self.stats.sort_stats('tottime')
+            restrictions = [focus, limit] if focus else [limit]
+            self.stats.print_stats(*restrictions)
+
+        return output.getvalue()
+
+class NullController:
+    """ Controller for replays, which records drags instead of moving the mouse """
+
+    def __init__(self):
+        self.drags = []
+
+    def left_mouse_drag(self, start, end):
+        self.drags.append((start, end))
+
+def replay(paths, solver, profiler, templates_path='templates/', digits_path='templates/digits.npz', workers=1):
+    """
+    Solves every screenshot showing a level with a fresh Vision and Bot,
+    profiling each as a level. Returns (path, seconds, result) per level,
+    the result being 'solved', 'unsolved' or 'failed: error'.
+    """
+    from puzbot.bot import Bot
+    from puzbot.digits import DigitClassifier
+    from puzbot.vision import ImageFileSource, Vision
+
+    digit_classifier = DigitClassifier.load(digits_path) if digits_path else None
+    results = []
+    for path in paths:
+        vision = Vision(ImageFileSource(path), templates_path=templates_path, digit_classifier=digit_classifier, workers=workers)
+        started_at = time.perf_counter()
+        try:
+            # Skip menus and completed levels, like Snapshot.has_puzzle
+            if not vision.get_game_board() or not vision.get_visible_cells() or not vision.get_pieces():
+                continue
+
+            # Start from a fresh frame, so recognition is profiled too
+            vision.refresh()
+            bot = Bot(vision, NullController(), solver, profiler=profiler)
+            started_at = time.perf_counter()
+            result = 'solved' if bot.do_moves() is not False else 'unsolved'
+        except Exception as error:
+            # One unreadable screenshot should not lose the profiles of the others
+            result = 'failed: %r' % error
+        finally:
+            if vision.executor is not None:
+                vision.executor.shutdown()
+        results.append((path, time.perf_counter() - started_at, result))
+
+    return results
+
+def main(argv):
+    from puzbot.benchmark import SOLVERS
+
+    parser = argparse.ArgumentParser(description='Profile the bot on screenshots')
+    parser.add_argument('screenshots', nargs='+')
+    parser.add_argument('--solver', choices=sorted(SOLVERS), default='backtracking', help='bruteforce takes minutes on the larger maps')
+    parser.add_argument('--mode', choices=LevelProfiler.MODES, default='cprofile')
+    parser.add_argument('--interval', type=float, default=0.001, help='Seconds between samples in sampling mode')
+    parser.add_argument('--output', help='Directory to write per level and aggregated profiles to')
+    parser.add_argument('--templates', default='templates/')
+    parser.add_argument('--no-classifier', action='store_true', help='Read all digits with Tesseract')
+    parser.add_argument('--workers', type=int, default=1, help='Recognition threads, only profiled in sampling mode')
+    parser.add_argument('--focus', help='Only report functions matching this regular expression')
+    parser.add_argument('--limit', type=int, default=25)
+    arguments = parser.parse_args(argv)
+
+    (solver_class, solver_arguments, _) = SOLVERS[arguments.solver]
+    profiler = LevelProfiler(arguments.output, arguments.mode, arguments.interval)
+    digits_path = None if arguments.no_classifier else os.path.join(arguments.templates, 'digits.npz')
+
+    for (path, seconds, result) in replay(arguments.screenshots, solver_class(**solver_arguments), profiler, arguments.templates, digits_path, arguments.workers):
+        print('%-45s %8.1fms %s' % (path, seconds * 1000, result))
+
+    profiler.save()
+    print(profiler.report(arguments.limit, arguments.focus))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,135 @@
+import collections
+from puzbot.solvers.board import CompiledBoard
+
+class BacktrackingSolver:
+    """
+    Depth-first search with constraint propagation.
+
+    Unlike BruteForceSolver, which tries every (free cell, piece) pair and
+    re-validates the whole board after each move, this solver:
+    - picks the most constrained free cell at every step and only branches on
+      the values that cell can take, so the same set of placements is never
+      explored in a different order;
+    - treats pieces as a multiset, so identical pieces are branched on once;
+    - keeps used values and running sums per row/column up to date as moves
+      are made and undone;
+    - prunes as soon as a constrained line can no longer reach its target sum.
+    """
+
+    def __init__(self, empty_value=0):
+        self.empty_value = empty_value
+        # Search nodes visited by the last solve
+        self.nodes = 0
+
+    def solve(self, board, pieces, constraints=[]):
+        self.nodes = 0
+        if len(pieces) == 0:
+            return []
+
+        state = self.prepare(board, pieces, constraints)
+        if state is None:
+            return False
+
+        if not self._search(state):
+            return False
+
+        return state.board.moves()
+
+    def prepare(self, board, pieces, constraints):
+        """ Builds the search state, or returns None if the puzzle is trivially unsolvable """
+        compiled_board = CompiledBoard(board, constraints, self.empty_value)
+        if not compiled_board.legal or len(compiled_board.free_cells) != len(pieces):
+            return None
+
+        state = SearchState(compiled_board, pieces)
+        if not all(state.within_bounds(line) for line in state.constrained_lines):
+            return None
+
+        return state
+
+    def _search(self, state):
+        self.nodes += 1
+        cell = state.most_constrained_cell()
+        if cell is None:
+            return True
+
+        (cell, candidates) = cell
+        for value in candidates:
+            state.place(cell, value)
+            if self._search(state):
+                return True
+            state.unplace(cell)
+
+        return False
+
+class SearchState:
+    """ Remaining piece multiset and sum bound checks on top of a CompiledBoard """
+
+    def __init__(self, board, pieces):
+        self.board = board
+        counts = collections.Counter(pieces)
+        self.values = sorted(counts)
+        self.counts = [counts[value] for value in self.values]
+        self.value_index = {value: index for (index, value) in enumerate(self.values)}
+        self.constrained_lines = [line for (line, target) in enumerate(board.targets) if target is not None]
+
+    def place(self, cell, value):
+        self.board.place(cell, value)
+        self.counts[self.value_index[value]] -= 1
+
+    def unplace(self, cell):
+        self.counts[self.value_index[self.board.values[cell]]] += 1
+        self.board.unplace(cell)
+
+    def candidates(self, cell):
+        """ Distinct piece values that can legally go into the given free cell """
+        board = self.board
+        result = []
+        for (index, value) in enumerate(self.values):
+            if self.counts[index] == 0 or not board.can_place(cell, value):
+                continue
+
+            self.place(cell, value)
+            if all(self.within_bounds(line) for line in board.cell_lines[cell]):
+                result.append(value)
+            self.unplace(cell)
+
+        return result
+
+    def most_constrained_cell(self):
+        """
+        Returns (cell, candidates) of the free cell with the fewest candidates,
+        (cell, []) if some cell has none left, or None if all cells are filled.
+        """
+        best = None
+        for cell in self.board.free_cells:
+            if not self.board.is_free(cell):
+                continue
+
+            candidates = self.candidates(cell)
+            if best is None or len(candidates) < len(best[1]):
+                best = (cell, candidates)
+                if not candidates:
+                    break
+
+        return best
+
+    def within_bounds(self, line):
+        """ Can the free cells of the line still be filled to reach its target sum """
+        board = self.board
+        if board.targets[line] is None:
+            return True
+
+        free = board.free[line]
+        missing = board.targets[line] - board.sums[line]
+        if free == 0:
+            return missing == 0
+
+        # Values within a line are unique, so each available value counts once
+        mask = board.masks[line]
+        available = [value for (index, value) in enumerate(self.values)
+                     if self.counts[index] > 0 and not mask & (1 << value)]
+        if len(available) < free:
+            return False
+
+        return sum(available[:free]) <= missing <= sum(available[-free:])
@@ -0,0 +1,135 @@
+import collections
+
+def is_solution(board, pieces, constraints, moves, empty_value=0):
+    """ Do the moves use up exactly the given pieces and fill the board legally """
+    if moves is False or collections.Counter(value for (_, _, value) in moves) != collections.Counter(pieces):
+        return False
+
+    filled = {(row, column): value for (row, column, value) in moves}
+    free_positions = set((row, column) for (row, column, value) in board if value == empty_value)
+    if len(filled) != len(moves) or not set(filled) <= free_positions:
+        return False
+
+    compiled_board = CompiledBoard(
+        [(row, column, filled.get((row, column), value)) for (row, column, value) in board],
+        constraints,
+        empty_value
+    )
+    return compiled_board.legal and not any(compiled_board.is_free(cell) for cell in compiled_board.free_cells)
+
+class CompiledBoard:
+    """
+    Compact, mutable board representation for solver inner loops.
+
+    Built once from the (row, column, value) tuple format:
+    - cells are numbered densely in board order;
+    - every row and column becomes a numbered line, and each cell knows
+      the (row line, column line) pair it belongs to;
+    - values used within a line are kept as an integer bitmask (bit v is set
+      when value v is on the line), sums and free cell counts as flat lists.
+
+    Moves are made and undone in place, touching only the two lines of the
+    changed cell, so searching on it allocates next to nothing.
+    """
+
+    def __init__(self, board, constraints=[], empty_value=0):
+        self.empty_value = empty_value
+        self.positions = []
+        self.values = []
+        self.cell_lines = []
+        self.line_keys = []
+
+        line_ids = {}
+        def line_id(key):
+            if key not in line_ids:
+                line_ids[key] = len(self.line_keys)
+                self.line_keys.append(key)
+            return line_ids[key]
+
+        for (row, column, value) in board:
+            self.positions.append((row, column))
+            self.values.append(value)
+            self.cell_lines.append((line_id((0, row)), line_id((1, column))))
+
+        # Constraints on lines without cells still need to be checked
+        for (dimension, index, target_sum) in constraints:
+            line_id((dimension, index))
+
+        lines = len(self.line_keys)
+        self.masks = [0] * lines
+        self.sums = [0] * lines
+        self.free = [0] * lines
+        self.targets = [None] * lines
+        self.free_cells = [cell for cell in range(len(self.values)) if self.is_free(cell)]
+
+        self.legal = True
+        for (dimension, index, target_sum) in constraints:
+            line = line_ids[(dimension, index)]
+            if self.targets[line] not in (None, target_sum):
+                self.legal = False
+            self.targets[line] = target_sum
+
+        for (cell, value) in enumerate(self.values):
+            if value < 0 and not self.is_free(cell):
+                # Values are bits of the line masks, a negative one is usually an empty marker the solver doesn't know
+                raise ValueError('Cell %s holds %d, but empty cells are marked with %d. Pass the board\'s empty marker as empty_value' % (self.positions[cell], value, empty_value))
+            for line in self.cell_lines[cell]:
+                if self.is_free(cell):
+                    self.free[line] += 1
+                    continue
+
+                if self.masks[line] & (1 << value):
+                    self.legal = False
+                self.masks[line] |= 1 << value
+                self.sums[line] += value
+
+        for line in range(lines):
+            if not self.within_target(line, self.sums[line], self.free[line]):
+                self.legal = False
+
+    def is_free(self, cell):
+        return self.values[cell] == self.empty_value
+
+    def within_target(self, line, line_sum, free):
+        """ A filled line must match its target sum, a partial one must not exceed it """
+        target = self.targets[line]
+        if target is None:
+            return True
+        if free == 0:
+            return line_sum == target
+        return line_sum <= target
+
+    def can_place(self, cell, value):
+        """ Would putting the value into the free cell keep the board legal """
+        bit = 1 << value
+        for line in self.cell_lines[cell]:
+            if self.masks[line] & bit:
+                return False
+            if not self.within_target(line, self.sums[line] + value, self.free[line] - 1):
+                return False
+        return True
+
+    def place(self, cell, value):
+        """ Puts the value into a free cell. Legality is checked by can_place """
+        self.values[cell] = value
+        for line in self.cell_lines[cell]:
+            self.masks[line] |= 1 << value
+            self.sums[line] += value
+            self.free[line] -= 1
+
+    def unplace(self, cell):
+        value = self.values[cell]
+        self.values[cell] = self.empty_value
+        for line in self.cell_lines[cell]:
+            self.masks[line] &= ~(1 << value)
+            self.sums[line] -= value
+            self.free[line] += 1
+
+    def move(self, cell):
+        """ Move in the tuple format which fills the given cell """
+        (row, column) = self.positions[cell]
+        return (row, column, self.values[cell])
+
+    def moves(self):
+        """ Moves filling every originally free cell which has been filled since """
+        return [self.move(cell) for cell in self.free_cells if not self.is_free(cell)]
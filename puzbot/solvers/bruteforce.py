@@ -1,41 +1,209 @@
 import itertools
+import multiprocessing
+from puzbot.solvers.board import CompiledBoard
+
+def _search_subtree(arguments):
+    """ (result, nodes) of a subtree searched in a worker, whose solver is a copy and can't count into the parent's """
+    (solver, board, pieces, constraints, prefix, find_all, limit) = arguments
+    result = solver.search_subtree(board, pieces, constraints, prefix, find_all, limit)
+    return (result, solver.nodes)
 
 class BruteForceSolver:
-    def __init__(self):
-        pass
+    def __init__(self, empty_value=0, processes=None, split_depth=2):
+        """
+        With more than one process the search tree is split into subtrees,
+        one for every legal assignment of the first `split_depth` free cells,
+        which are searched in a process pool.
+        """
+        self.empty_value = empty_value
+        self.processes = processes
+        self.split_depth = split_depth
+        # Search nodes visited by the last solve
+        self.nodes = 0
 
     def solve(self, board, pieces, constraints=[]):
+        self.nodes = 0
         if len(pieces) == 0:
             return []
 
-        for (move, new_board, new_pieces, new_constraints) in self.legal_moves(board, pieces, constraints):
-            solution = self.solve(new_board, new_pieces, new_constraints)
-            if solution != False:
-                return [move] + solution
+        compiled_board = CompiledBoard(board, constraints, self.empty_value)
+        if not compiled_board.legal:
+            return False
+
+        if self.is_parallel() and len(compiled_board.free_cells) == len(pieces):
+            return self._solve_parallel(board, pieces, constraints, compiled_board)
+
+        return self._solve(compiled_board, list(pieces))
+
+    def solve_all(self, board, pieces, constraints=[], limit=None):
+        """
+        Returns every distinct solution, each as moves in board order, or the
+        first `limit` of them. Expects as many pieces as there are free cells,
+        as in the game.
+        """
+        self.nodes = 0
+        compiled_board = CompiledBoard(board, constraints, self.empty_value)
+        if not compiled_board.legal or len(compiled_board.free_cells) != len(pieces):
+            return []
+
+        if self.is_parallel():
+            return self._solve_parallel(board, pieces, constraints, compiled_board, find_all=True, limit=limit)
+
+        solutions = []
+        self._solve_all(compiled_board, list(pieces), solutions, limit)
+        return solutions
+
+    def count_solutions(self, board, pieces, constraints=[], limit=2):
+        """
+        Counts distinct solutions, stopping at `limit`. With the default limit
+        this tells whether a puzzle has no, exactly one or several solutions.
+        """
+        return len(self.solve_all(board, pieces, constraints, limit))
+
+    def is_parallel(self):
+        return self.processes is not None and self.processes > 1
+
+    def _solve_parallel(self, board, pieces, constraints, compiled_board, find_all=False, limit=None):
+        """
+        Searches subtrees in a process pool. Subtrees are handed out one at a
+        time as workers free up, and the pool is torn down as soon as a
+        solution is found, unless all solutions are wanted. Nodes searched by
+        the workers are added to the ones visited splitting the tree.
+        """
+        prefixes = self.split(compiled_board, list(pieces), min(self.split_depth, len(pieces)))
+        work = ((self, board, pieces, constraints, prefix, find_all, limit) for prefix in prefixes)
+        solutions = []
+
+        with multiprocessing.Pool(self.processes) as pool:
+            for (result, nodes) in pool.imap_unordered(_search_subtree, work, chunksize=1):
+                self.nodes += nodes
+                if find_all:
+                    solutions.extend(result)
+                    if limit is not None and len(solutions) >= limit:
+                        return solutions[:limit]
+                elif result is not False:
+                    return result
+
+        return solutions if find_all else False
+
+    def split(self, board, pieces, depth):
+        """ Legal assignments of distinct values to the first `depth` free cells, as move lists """
+        if depth == 0:
+            return [[]]
+
+        self.nodes += 1
+        cell = next(cell for cell in board.free_cells if board.is_free(cell))
+        prefixes = []
+        for piece in sorted(set(pieces)):
+            if not board.can_place(cell, piece):
+                continue
+
+            board.place(cell, piece)
+            pieces.remove(piece)
+            prefixes.extend([board.move(cell)] + prefix for prefix in self.split(board, pieces, depth - 1))
+            pieces.append(piece)
+            board.unplace(cell)
+
+        return prefixes
+
+    def search_subtree(self, board, pieces, constraints, prefix, find_all=False, limit=None):
+        """ Searches the part of the tree below the given moves, see _solve_parallel """
+        self.nodes = 0
+        compiled_board = CompiledBoard(board, constraints, self.empty_value)
+        cells = {compiled_board.positions[cell]: cell for cell in compiled_board.free_cells}
+        pieces = list(pieces)
+        for (row, column, piece) in prefix:
+            compiled_board.place(cells[(row, column)], piece)
+            pieces.remove(piece)
+
+        if find_all:
+            solutions = []
+            self._solve_all(compiled_board, pieces, solutions, limit)
+            return solutions
+
+        solution = self._solve(compiled_board, pieces)
+        return False if solution is False else list(prefix) + solution
+
+    def _solve(self, board, pieces):
+        """ Tries every legal (free cell, piece) move on a compiled board, undoing moves on the way back """
+        self.nodes += 1
+        if len(pieces) == 0:
+            return []
+
+        for cell in board.free_cells:
+            if not board.is_free(cell):
+                continue
+
+            for index in range(len(pieces)):
+                piece = pieces[index]
+                if not board.can_place(cell, piece):
+                    continue
+
+                board.place(cell, piece)
+                pieces.pop(index)
+                solution = self._solve(board, pieces)
+                pieces.insert(index, piece)
+                move = board.move(cell)
+                board.unplace(cell)
+
+                if solution != False:
+                    return [move] + solution
 
         return False
 
-    def is_legal(self, board, constraints):
+    def _solve_all(self, board, pieces, solutions, limit=None):
         """
-        Is the board legal.
-        - Rows and columns contain no duplicates
-        - If there are constraints and all cells are filled in a given column - the sum of the column does not exceed the constraint
-        - If all cells are filled in - constraint matches
+        Collects all solutions, or up to `limit` of them, into `solutions`.
+        Free cells are filled in board order with distinct piece values, so
+        each solution is found once, and illegal partial boards are pruned.
         """
+        self.nodes += 1
+        if limit is not None and len(solutions) >= limit:
+            return
+
+        cell = next((cell for cell in board.free_cells if board.is_free(cell)), None)
+        if cell is None:
+            solutions.append(board.moves())
+            return
 
-        lines = self.rows(board) + self.columns(board)
+        for piece in sorted(set(pieces)):
+            if not board.can_place(cell, piece):
+                continue
 
-        no_duplicates = all(self.all_unique(self.filled_cells(line)) for line in lines)
-        satisfies_constraints = all(self.satisfies_constraint(board, c) for c in constraints)
+            board.place(cell, piece)
+            pieces.remove(piece)
+            self._solve_all(board, pieces, solutions, limit)
+            pieces.append(piece)
+            board.unplace(cell)
 
-        return no_duplicates and satisfies_constraints
+    def is_legal(self, board, constraints):
+        """
+        Is the board legal.
+        - Rows and columns contain no duplicates
+        - If there are constraints and not all cells of the line are filled in - the sum of the line does not exceed the constraint
+        - If all cells of the line are filled in - constraint matches
+        """
+        return CompiledBoard(board, constraints, self.empty_value).legal
 
     def legal_moves(self, board, pieces, constraints):
-        return (move for move in self.all_moves(board, pieces, constraints) if self.is_legal(move[1], constraints))
+        """
+        all_moves which keep the board legal. Moves are checked with
+        can_place on one compiled board, only legal ones copy the board.
+        """
+        compiled_board = CompiledBoard(board, constraints, self.empty_value)
+        if not compiled_board.legal:
+            return
+
+        for cell in compiled_board.free_cells:
+            (row, column) = compiled_board.positions[cell]
+            for piece in pieces:
+                if compiled_board.can_place(cell, piece):
+                    move = (row, column, piece)
+                    yield (move,) + self.perform_move(move, board, pieces, constraints)
 
     def all_moves(self, board, pieces, constraints):
         """ Attempt to put one of available pieces into the available spaces on the board """
-        free_cells = [(c[0], c[1]) for c in board if c[2] == 0]
+        free_cells = [(c[0], c[1]) for c in board if c[2] == self.empty_value]
         return (
             ((row, column, piece), new_board, new_pieces, constraints)
             for (row, column) in free_cells
@@ -49,7 +217,7 @@ class BruteForceSolver:
         new_pieces.remove(move[2])
 
         new_board = board.copy()
-        new_board.remove((move[0], move[1], 0))
+        new_board.remove((move[0], move[1], self.empty_value))
         new_board.append(move)
 
         return new_board, new_pieces, constraints
@@ -67,7 +235,8 @@ class BruteForceSolver:
         return [[c[2] for c in group] for index, group in groups]
 
     def filled_cells(self, line):
-        return [x for x in line if x != 0]
+        return [x for x in line if x != self.empty_value]
+
 
     def all_unique(self, line):
         return len(line) == len(set(line))
@@ -0,0 +1,33 @@
+from puzbot.cache import PersistentCache
+from puzbot.solvers.canonical import canonicalize, canonical_form, fingerprint
+
+class CachedSolver:
+    """
+    Solution cache in front of any solver.
+
+    Solutions are stored in canonical coordinates under the puzzle fingerprint,
+    so a repeated level is answered without solving, even if the game window
+    moved. With `symmetric` enabled, levels which are row/column permutations
+    or transposes of each other share an entry too. Unsolvable puzzles are not
+    cached, as they usually come from misrecognized boards.
+    """
+
+    def __init__(self, solver, cache=None, symmetric=False):
+        self.solver = solver
+        self.cache = cache if cache is not None else PersistentCache()
+        self.symmetric = symmetric
+
+    def solve(self, board, pieces, constraints=[]):
+        canonical = canonical_form if self.symmetric else canonicalize
+        (canonical_puzzle, transform) = canonical(board, pieces, constraints)
+        key = fingerprint(canonical_puzzle)
+
+        cached_moves = self.cache.get(key)
+        if cached_moves is not None:
+            return transform.moves_to_original(cached_moves)
+
+        moves = self.solver.solve(board, pieces, constraints)
+        if moves is not False:
+            self.cache.put(key, transform.moves_to_canonical(moves))
+
+        return moves
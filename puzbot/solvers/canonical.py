@@ -0,0 +1,159 @@
+import hashlib
+import itertools
+import json
+import math
+
+class Transform:
+    """
+    Maps between the coordinates of a live board and its canonical form.
+
+    Canonical row i is row row_order[i] of the (optionally transposed) rank
+    normalized board, and rows/columns hold the live row and column keys.
+    """
+
+    def __init__(self, rows, columns, row_order, column_order, transposed=False):
+        self.rows = rows
+        self.columns = columns
+        self.row_order = row_order
+        self.column_order = column_order
+        self.transposed = transposed
+
+    def to_original(self, row, column):
+        (a, b) = (self.row_order[row], self.column_order[column])
+        (row_rank, column_rank) = (b, a) if self.transposed else (a, b)
+        return (self.rows[row_rank], self.columns[column_rank])
+
+    def to_canonical(self, row, column):
+        (a, b) = (self.rows.index(row), self.columns.index(column))
+        if self.transposed:
+            (a, b) = (b, a)
+        return (self.row_order.index(a), self.column_order.index(b))
+
+    def moves_to_original(self, moves):
+        return [self.to_original(row, column) + (value,) for (row, column, value) in moves]
+
+    def moves_to_canonical(self, moves):
+        return [self.to_canonical(row, column) + (value,) for (row, column, value) in moves]
+
+def canonicalize(board, pieces, constraints):
+    """
+    Returns the canonical form of a puzzle and a Transform back to the live board.
+
+    Row and column keys (e.g. pixel offsets) are replaced by their rank, cells,
+    pieces and constraints are sorted. Puzzles which only differ in window
+    position or input order share a canonical form.
+    """
+    rows = sorted(set([row for (row, _, _) in board] + [index for (dimension, index, _) in constraints if dimension == 0]))
+    columns = sorted(set([column for (_, column, _) in board] + [index for (dimension, index, _) in constraints if dimension == 1]))
+    ranks = ({row: rank for (rank, row) in enumerate(rows)}, {column: rank for (rank, column) in enumerate(columns)})
+
+    canonical_board = sorted((ranks[0][row], ranks[1][column], value) for (row, column, value) in board)
+    canonical_constraints = sorted((dimension, ranks[dimension][index], target_sum) for (dimension, index, target_sum) in constraints)
+    transform = Transform(rows, columns, list(range(len(rows))), list(range(len(columns))))
+
+    return ((canonical_board, sorted(pieces), canonical_constraints), transform)
+
+def fingerprint(canonical_puzzle):
+    """ Stable hash of a canonical puzzle """
+    return hashlib.sha1(json.dumps(canonical_puzzle).encode('utf-8')).hexdigest()
+
+def canonical_form(board, pieces, constraints, max_orderings=5040):
+    """
+    Reduces a puzzle under row permutation, column permutation and transposition.
+
+    Uniqueness and sum rules don't change when rows or columns are reordered or
+    the board is transposed, so equivalent puzzles can share one solution.
+    Rows and columns are ordered by iteratively refined invariants (contents,
+    target sums and the invariants of crossing lines). Rows or columns which
+    still tie are tried in every order while there are at most
+    `max_orderings` combinations, and the lexicographically smallest result is
+    picked. Beyond that ties keep their input order: the result is then still
+    an equivalent puzzle, just not guaranteed to be shared by all equivalents.
+
+    Returns (canonical puzzle, Transform back to the live board).
+    """
+    ((ranked_board, sorted_pieces, ranked_constraints), ranked) = canonicalize(board, pieces, constraints)
+    (rows, columns) = (ranked.rows, ranked.columns)
+
+    best = None
+    for transposed in (False, True):
+        if transposed:
+            oriented_board = [(column, row, value) for (row, column, value) in ranked_board]
+            oriented_constraints = [(1 - dimension, index, target_sum) for (dimension, index, target_sum) in ranked_constraints]
+            (row_count, column_count) = (len(columns), len(rows))
+        else:
+            (oriented_board, oriented_constraints) = (ranked_board, ranked_constraints)
+            (row_count, column_count) = (len(rows), len(columns))
+
+        (row_colors, column_colors) = _refine(oriented_board, oriented_constraints, row_count, column_count)
+        for (row_order, column_order) in _orderings(row_colors, column_colors, max_orderings):
+            row_position = {row: position for (position, row) in enumerate(row_order)}
+            column_position = {column: position for (position, column) in enumerate(column_order)}
+            position = (row_position, column_position)
+
+            candidate = (
+                sorted((row_position[row], column_position[column], value) for (row, column, value) in oriented_board),
+                sorted_pieces,
+                sorted((dimension, position[dimension][index], target_sum) for (dimension, index, target_sum) in oriented_constraints),
+            )
+            if best is None or candidate < best[0]:
+                best = (candidate, Transform(rows, columns, row_order, column_order, transposed))
+
+    return best
+
+def _refine(board, constraints, row_count, column_count):
+    """ Colors rows and columns so that lines with equal colors are indistinguishable by their invariants """
+    targets = ([[] for _ in range(row_count)], [[] for _ in range(column_count)])
+    for (dimension, index, target_sum) in constraints:
+        targets[dimension][index].append(target_sum)
+
+    row_cells = [[] for _ in range(row_count)]
+    column_cells = [[] for _ in range(column_count)]
+    for (row, column, value) in board:
+        row_cells[row].append((column, value))
+        column_cells[column].append((row, value))
+
+    row_colors = [0] * row_count
+    column_colors = [0] * column_count
+    while True:
+        new_row_colors = _ranks([
+            (row_colors[row], tuple(sorted(targets[0][row])), tuple(sorted((column_colors[column], value) for (column, value) in row_cells[row])))
+            for row in range(row_count)
+        ])
+        new_column_colors = _ranks([
+            (column_colors[column], tuple(sorted(targets[1][column])), tuple(sorted((new_row_colors[row], value) for (row, value) in column_cells[column])))
+            for column in range(column_count)
+        ])
+
+        stable = len(set(new_row_colors)) == len(set(row_colors)) and len(set(new_column_colors)) == len(set(column_colors))
+        (row_colors, column_colors) = (new_row_colors, new_column_colors)
+        if stable:
+            return (row_colors, column_colors)
+
+def _ranks(keys):
+    ranks = {key: rank for (rank, key) in enumerate(sorted(set(keys)))}
+    return [ranks[key] for key in keys]
+
+def _orderings(row_colors, column_colors, max_orderings):
+    """ Orders lines by color, permuting lines which share a color while affordable """
+    row_groups = _groups(row_colors)
+    column_groups = _groups(column_colors)
+
+    combinations = 1
+    for group in row_groups + column_groups:
+        combinations *= math.factorial(len(group))
+
+    if combinations > max_orderings:
+        yield (list(itertools.chain(*row_groups)), list(itertools.chain(*column_groups)))
+        return
+
+    for row_order in _group_permutations(row_groups):
+        for column_order in _group_permutations(column_groups):
+            yield (row_order, column_order)
+
+def _groups(colors):
+    return [[line for line in range(len(colors)) if colors[line] == color] for color in sorted(set(colors))]
+
+def _group_permutations(groups):
+    for permutation in itertools.product(*[itertools.permutations(group) for group in groups]):
+        yield list(itertools.chain(*permutation))
@@ -0,0 +1,84 @@
+import collections
+import multiprocessing
+import queue
+import time
+
+from puzbot.solvers.backtracking import BacktrackingSolver
+from puzbot.solvers.board import is_solution
+from puzbot.solvers.bruteforce import BruteForceSolver
+from puzbot.solvers.z3 import Z3Solver
+
+def default_solvers(empty_value=-1):
+    """ (name, solver) pairs covering fast-on-small and robust-on-large engines """
+    return [
+        ('backtracking', BacktrackingSolver(empty_value=empty_value)),
+        ('bruteforce', BruteForceSolver(empty_value=empty_value)),
+        ('z3-pb', Z3Solver(encoding='pb')),
+        ('z3-pb-seed-1', Z3Solver(encoding='pb', seed=1)),
+        ('z3-int', Z3Solver(encoding='int')),
+    ]
+
+def _solve_in_process(index, solver, board, pieces, constraints, results):
+    try:
+        results.put((index, solver.solve(board, pieces, constraints)))
+    except Exception:
+        results.put((index, False))
+
+class PortfolioSolver:
+    """
+    Races several solvers in separate processes.
+
+    The first valid solution wins and the remaining processes are killed.
+    The name of the winning solver is kept in `winner`, and the number of
+    wins per solver in `wins`, to tune which engines are worth running.
+    Z3 solvers expect -1 as the empty cell marker, so all solvers in a
+    portfolio should be configured to use the same marker as `empty_value`.
+    """
+
+    def __init__(self, solvers=None, timeout=None, empty_value=-1):
+        self.solvers = solvers if solvers is not None else default_solvers(empty_value)
+        self.timeout = timeout
+        self.empty_value = empty_value
+        self.winner = None
+        self.wins = collections.Counter()
+
+    def solve(self, board, pieces, constraints=[]):
+        self.winner = None
+        if len(pieces) == 0:
+            return []
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_solve_in_process, args=(index, solver, board, pieces, constraints, results), daemon=True)
+            for (index, (_, solver)) in enumerate(self.solvers)
+        ]
+        for process in processes:
+            process.start()
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        pending = len(processes)
+        try:
+            while pending > 0:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+
+                try:
+                    (index, moves) = results.get(timeout=0.05)
+                except queue.Empty:
+                    # Solvers which died without reporting back won't ever answer
+                    if not any(process.is_alive() for process in processes) and results.empty():
+                        return False
+                    continue
+
+                pending -= 1
+                if is_solution(board, pieces, constraints, moves, self.empty_value):
+                    self.winner = self.solvers[index][0]
+                    self.wins[self.winner] += 1
+                    return moves
+
+            return False
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
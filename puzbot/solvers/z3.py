@@ -1,40 +1,187 @@
 import itertools
-from z3 import Solver, Int, Or, sat, Distinct, Sum, If
+from z3 import Solver, Int, Bool, Or, Not, sat, Distinct, Sum, If, PbEq, AtMost, BoolVal, is_true
 import collections
 
 class Z3Solver:
-    def __init__(self):
-        pass
+    """
+    Supported encodings:
+    - 'pb' (default) - a boolean per (cell, value) pair, with pseudo-boolean
+      cardinality constraints for uniqueness, piece counts and target sums.
+      Much faster than 'int' on large boards, see puzbot.benchmark;
+    - 'int' - an integer variable per cell, Distinct rows/columns and
+      arithmetic sums.
+    """
+
+    ENCODINGS = ('int', 'pb')
+
+    def __init__(self, incremental=False, encoding='pb', seed=None):
+        """
+        In incremental mode a solver context with the structural constraints
+        is kept per board topology (set of cell coordinates). Each solve only
+        adds the level specific facts within a push()/pop() scope.
+
+        A seed sets Z3's random seed, to run differently diversified searches.
+        """
+        if encoding not in self.ENCODINGS:
+            raise ValueError('Unknown encoding: %s' % encoding)
+
+        self.incremental = incremental
+        self.encoding = encoding
+        self.seed = seed
+        self.contexts = {}
+        # Search decisions made by Z3 during the last solve
+        self.nodes = 0
 
     def solve(self, board, pieces, sum_requirements=[]):
         if len(pieces) == 0:
             return []
 
+        return self.with_level(board, pieces, sum_requirements, self.find_moves)
+
+    def count_solutions(self, board, pieces, sum_requirements=[], limit=2):
+        """
+        Counts distinct solutions, stopping at `limit`, by blocking every model
+        found and asking for another one. With the default limit this tells
+        whether a puzzle has no, exactly one or several solutions.
+        """
+        if len(pieces) == 0:
+            return 1
+
+        def count_models(solver, extended_board):
+            count = 0
+            while count < limit:
+                moves = self.find_moves(solver, extended_board)
+                if moves is False:
+                    break
+
+                count += 1
+                solver.add(self.block_moves(extended_board, moves))
+            return count
+
+        return self.with_level(board, pieces, sum_requirements, count_models)
+
+    def with_level(self, board, pieces, sum_requirements, search):
+        """
+        Adds the level constraints to the board's solver and runs search(solver, extended_board).
+        In incremental mode this happens within a push()/pop() scope.
+        """
+        (solver, cells) = self.get_context(board, pieces)
+        extended_board = self.extend_board(board, cells)
+        constraints = self.level_constraints(extended_board, pieces, sum_requirements)
+
+        if not self.incremental:
+            solver.add(*constraints)
+            return search(solver, extended_board)
+
+        solver.push()
+        try:
+            solver.add(*constraints)
+            return search(solver, extended_board)
+        finally:
+            solver.pop()
+
+    def __getstate__(self):
+        # Z3 objects can't be pickled, contexts get rebuilt on demand
+        state = self.__dict__.copy()
+        state['contexts'] = {}
+        return state
+
+    def topology(self, board):
+        return tuple(sorted((row, column) for (row, column, _) in board))
+
+    def get_context(self, board, pieces):
+        """ Returns a (solver, cell variables) pair with structural constraints for the board topology """
+        topology = self.topology(board)
+
+        if self.incremental and topology in self.contexts:
+            context = self.contexts[topology]
+        else:
+            context = self.create_context(topology)
+            if self.incremental:
+                self.contexts[topology] = context
+
+        if self.encoding == 'pb':
+            values = set(pieces) | set(value for (_, _, value) in board if not self.is_cell_empty(value))
+            self.pb_add_cell_values(context, values)
+
+        return context
+
+    def create_context(self, topology):
         solver = Solver()
+        if self.seed is not None:
+            solver.set('random_seed', self.seed)
+
+        if self.encoding == 'int':
+            cells = {(row, column): Int(self.cell_name(row, column)) for (row, column) in topology}
+            extended_board = [(row, column, None, cell) for ((row, column), cell) in cells.items()]
+            solver.add(*self.require_unique_row_and_column_cells(extended_board))
+        else:
+            # Per-value variables are added as values show up, see pb_add_cell_values
+            cells = {(row, column): {} for (row, column) in topology}
+
+        return (solver, cells)
+
+    def pb_add_cell_values(self, context, values):
+        """ Creates (cell, value) variables for values not seen before, with their uniqueness constraints """
+        (solver, cells) = context
+        known_values = next(iter(cells.values())).keys()
+        new_values = sorted(set(values) - set(known_values))
+
+        for ((row, column), cell) in cells.items():
+            for value in new_values:
+                cell[value] = Bool(self.cell_value_name(row, column, value))
+
+        extended_board = [(row, column, None, cell) for ((row, column), cell) in cells.items()]
+        solver.add(*self.pb_require_unique_row_and_column_cells(extended_board, new_values))
 
-        # Create z3 variables for each cell
-        extended_board = [(row, column, value, Int(self.cell_name(row, column))) for (row, column, value) in board]
+    def extend_board(self, board, cells):
+        return [(row, column, value, cells[(row, column)]) for (row, column, value) in board]
 
-        constraints = \
-            self.set_prefilled_cell_values(extended_board) + \
-            self.set_possible_target_cell_values(extended_board, pieces) + \
-            self.require_unique_row_and_column_cells(extended_board) + \
-            self.match_sum_requirements(extended_board, sum_requirements) + \
-            self.target_cells_use_all_available_pieces(extended_board, pieces)
+    def level_constraints(self, board, pieces, sum_requirements):
+        """ Constraints which depend on the level contents rather than the board shape """
+        if self.encoding == 'int':
+            return \
+                self.set_prefilled_cell_values(board) + \
+                self.set_possible_target_cell_values(board, pieces) + \
+                self.match_sum_requirements(board, sum_requirements) + \
+                self.target_cells_use_all_available_pieces(board, pieces)
 
-        for constraint in constraints:
-            solver.add(constraint)
+        return \
+            self.pb_one_value_per_cell(board) + \
+            self.pb_set_prefilled_cell_values(board) + \
+            self.pb_set_possible_target_cell_values(board, pieces) + \
+            self.pb_match_sum_requirements(board, sum_requirements) + \
+            self.pb_target_cells_use_all_available_pieces(board, pieces)
 
-        if solver.check() == sat:
+    def find_moves(self, solver, extended_board):
+        result = solver.check()
+        statistics = solver.statistics()
+        self.nodes = statistics.get_key_value('decisions') if 'decisions' in statistics.keys() else 0
+
+        if result == sat:
             model = solver.model()
             return [
-                (row, column, model[cell].as_long())
+                (row, column, self.cell_value(model, cell))
                     for (row, column, value, cell) in extended_board
                     if self.is_cell_empty(value)
             ]
         else:
             return False
 
+    def block_moves(self, extended_board, moves):
+        """ Constraint ruling out the given solution """
+        cells = {(row, column): cell for (row, column, _, cell) in extended_board}
+        if self.encoding == 'int':
+            return Or(*[cells[(row, column)] != value for (row, column, value) in moves])
+
+        return Or(*[Not(cells[(row, column)][value]) for (row, column, value) in moves])
+
+    def cell_value(self, model, cell):
+        if self.encoding == 'int':
+            return model[cell].as_long()
+
+        return next(value for (value, is_value) in cell.items() if is_true(model.eval(is_value)))
+
     def set_prefilled_cell_values(self, board):
         return [cell == value for (_, _, value, cell) in board if not self.is_cell_empty(value)]
 
@@ -78,8 +225,65 @@ class Z3Solver:
 
         return constraints
 
+    def pb_one_value_per_cell(self, board):
+        return [PbEq([(is_value, 1) for is_value in cell.values()], 1) for (_, _, _, cell) in board]
+
+    def pb_require_unique_row_and_column_cells(self, board, values):
+        constraints = []
+        for dimension in (0, 1):
+            lines = collections.defaultdict(list)
+            for cell in board:
+                lines[cell[dimension]].append(cell[3])
+
+            for cells in lines.values():
+                if len(cells) < 2:
+                    continue
+                for value in values:
+                    constraints.append(AtMost(*[cell[value] for cell in cells], 1))
+
+        return constraints
+
+    def pb_set_prefilled_cell_values(self, board):
+        return [cell[value] for (_, _, value, cell) in board if not self.is_cell_empty(value)]
+
+    def pb_set_possible_target_cell_values(self, board, pieces):
+        """ Rules out values known to the context which are not available in this level """
+        piece_values = set(pieces)
+        return [
+            Not(is_value)
+                for (_, _, value, cell) in board
+                for (possible_value, is_value) in cell.items()
+                if possible_value not in piece_values and (self.is_cell_empty(value) or possible_value != value)
+        ]
+
+    def pb_match_sum_requirements(self, board, sum_requirements):
+        constraints = []
+        for (dimension, index, target_sum) in sum_requirements:
+            weighted_values = [
+                (is_value, value)
+                    for cell in board if cell[dimension] == index
+                    for (value, is_value) in cell[3].items() if value != 0
+            ]
+            if weighted_values:
+                constraints.append(PbEq(weighted_values, target_sum))
+            else:
+                constraints.append(BoolVal(target_sum == 0))
+
+        return constraints
+
+    def pb_target_cells_use_all_available_pieces(self, board, pieces):
+        constraints = []
+        for (piece, quantity) in collections.Counter(pieces).items():
+            uses_piece = [(cell[piece], 1) for (_, _, value, cell) in board if self.is_cell_empty(value)]
+            constraints.append(PbEq(uses_piece, quantity) if uses_piece else BoolVal(False))
+
+        return constraints
+
     def cell_name(self, row, column):
         return 'c_%d_%d' % (row, column)
 
+    def cell_value_name(self, row, column, value):
+        return 'c_%d_%d_is_%d' % (row, column, value)
+
     def is_cell_empty(self, value):
         return value == -1
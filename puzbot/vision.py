@@ -1,43 +1,107 @@
 import cv2
+import hashlib
 import numpy as np
 import time
 import pytesseract
-from PIL import Image
 from mss import mss
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import os
 import imutils
 import itertools
 
+Board = namedtuple('Board', ['x', 'y', 'w', 'h', 'screen'])
+
 class ImageFileSource:
     def __init__(self, path):
         self.path = path
+        self.origin = (0, 0)
 
     def get(self):
         return cv2.imread(self.path)
 
+    def refresh(self):
+        return self.get()
+
+    def capture(self):
+        """ (image, origin) of a new frame """
+        return (self.get(), self.origin)
+
 class ScreenshotSource:
-    def __init__(self):
-        self.monitor = {'top': 0, 'left': 0, 'width': 1920, 'height': 1080}
-        self.screen = mss()
+    """
+    Captures the screen, or a region of it, with mss.
+
+    Frames wrap the BGRA buffer mss returns without copying it through PIL.
+    By default it is converted to a contiguous BGR image with one OpenCV call.
+    With zero_copy enabled the image is a strided BGR view of the buffer
+    instead, which saves the conversion but makes every OpenCV call on the
+    frame copy it internally, so it only pays off when little of the frame
+    is read.
+    """
+
+    def __init__(self, monitor=None, zero_copy=False):
+        self.screen_monitor = monitor or {'top': 0, 'left': 0, 'width': 1920, 'height': 1080}
+        self.monitor = self.screen_monitor
+        self.zero_copy = zero_copy
+        self._screen = None
         self.image = None
+        # Screen coordinates of the top left corner of the captured image
+        self.origin = (0, 0)
+
+    @property
+    def screen(self):
+        # Created on first use, as mss handles should stay on the thread grabbing with them
+        if self._screen is None:
+            self._screen = mss()
+        return self._screen
 
     def get(self):
         if self.image is None:
-            self.image = self.refresh()
+            self.refresh()
 
         return self.image
 
+    def focus(self, x, y, width, height):
+        """ Captures only the given screen region, clipped to the screen, from the next refresh on """
+        self.monitor = self.clip(x, y, width, height)
+
+    def unfocus(self):
+        self.monitor = self.screen_monitor
+
+    def clip(self, x, y, width, height):
+        screen = self.screen_monitor
+        left = max(x, screen['left'])
+        top = max(y, screen['top'])
+        right = min(x + width, screen['left'] + screen['width'])
+        bottom = min(y + height, screen['top'] + screen['height'])
+
+        return {'top': top, 'left': left, 'width': right - left, 'height': bottom - top}
+
     def refresh(self):
-        source_image = self.screen.grab(self.monitor)
-        rgb_image = Image.frombytes('RGB', source_image.size, source_image.rgb)
-        rgb_image = np.array(rgb_image)
-        bgr_image = self.convert_rgb_to_bgr(rgb_image)
+        (self.image, self.origin) = self.capture()
 
-        return bgr_image
+        return self.image
 
-    def convert_rgb_to_bgr(self, img):
-        return img[:, :, ::-1]
+    def capture(self):
+        """
+        (image, origin) of a new frame. The monitor is read once, as focus
+        may change it from another thread while a capture thread grabs.
+        """
+        monitor = self.monitor
+        return (self.grab(monitor), (monitor['left'], monitor['top']))
+
+    def grab_regions(self, regions):
+        """ Captures (x, y, width, height) screen regions, returning a BGR image for each """
+        return [self.grab(self.clip(*region)) for region in regions]
+
+    def grab(self, monitor):
+        source_image = self.screen.grab(monitor)
+        bgra_image = np.frombuffer(source_image.raw, dtype=np.uint8).reshape(source_image.height, source_image.width, 4)
+
+        if self.zero_copy:
+            return bgra_image[:, :, :3]
+
+        return cv2.cvtColor(bgra_image, cv2.COLOR_BGRA2BGR)
 
 def cache_until_refresh(func):
     def wrapper(self):
@@ -51,22 +115,130 @@ def cache_until_refresh(func):
     return wrapper
 
 class Vision:
-    def __init__(self, source, templates_path=''):
+    # Pixels captured around a tracked board, to verify its black frame
+    BOARD_MARGIN = 8
+
+    # Side of the pixel blocks compared between frames, and the change in mean intensity that counts
+    DIFF_BLOCK = 8
+    DIFF_THRESHOLD = 8
+    # Larger changes mean a different screen, where nothing should be reused
+    DIFF_MAX_CHANGED = 0.25
+    # Pixels around the tiles searched for target sum indicators
+    INDICATOR_MARGIN = 24
+    # Target sum (x offset, y offset, width, height) relative to indicators pointing left, top, right and bottom
+    TARGET_SUM_REGIONS = [
+        ('row', (-32, -15, 32, 42)),
+        ('column', (-15, -32, 42, 32)),
+        ('row', (8, -15, 32, 42)),
+        ('column', (-15, 8, 42, 32)),
+    ]
+
+    def __init__(self, source, templates_path='', batch_ocr=False, digit_classifier=None, ocr_cache=None, track_board=False, diff_frames=False, indicator_scales=(1.0,), workers=1, debug=None):
+        """
+        With batch_ocr enabled all tiles of a kind are recognized by a single
+        Tesseract run over a sheet composed of the tiles, instead of one
+        Tesseract process per tile.
+
+        A digit_classifier (see puzbot.digits) reads numbers by template
+        matching first, leaving Tesseract only the images it is not confident about.
+
+        An ocr_cache (a puzbot.cache.PersistentCache) remembers recognized
+        numbers by the hash of their binarized image, across refreshes, levels
+        and runs. Create it with autosave disabled to write it once per frame.
+        Numbers Tesseract could not read are not remembered.
+
+        With track_board enabled the game board rectangle found on one frame
+        is reused on the next ones as long as it is still framed by the black
+        background, and sources which support it capture only that region.
+
+        With diff_frames enabled a downsampled copy of the board is compared
+        with the one recognition last ran on. Tiles in unchanged blocks keep
+        their recognized content, and constraints are reused while the blocks
+        around them are unchanged.
+
+        Target sum indicator templates are prepared once, on first use,
+        rotated in all four directions and resized to each of
+        indicator_scales, to find them on game windows of other sizes too.
+
+        With more than one worker, tiles and target sums which are not
+        batched are recognized concurrently by a pool of that many threads.
+        OpenCV and the Tesseract processes release the GIL, so this scales
+        with cores. Results keep their order.
+
+        A debug overlay (a puzbot.debug.DebugOverlay) receives the board and
+        everything recognized on it, to draw and dump annotated frames.
+        Without one recognition never copies or draws on frames.
+        """
         self.source = source
         self.templates_path = templates_path
+        self.batch_ocr = batch_ocr
+        self.digit_classifier = digit_classifier
+        self.ocr_cache = ocr_cache
+        self.ocr_cache_unsaved = False
+        self.track_board = track_board
+        # Last known board rectangle in screen coordinates, kept across refreshes
+        self.board_region = None
+        self.diff_frames = diff_frames
+        # (thumbnail, results) of the frame recognition last ran on, kept across refreshes
+        self.previous_cells = None
+        self.previous_constraints = None
+        self.indicator_scales = indicator_scales
+        # Loaded on first use, see indicator_templates
+        self._indicator_templates = None
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='recognition') if workers > 1 else None
+        self.debug = debug
         self.cache = {}
 
     def refresh(self):
+        if self.debug is not None:
+            self.debug.finish()
         self.cache = {}
         self.source.refresh()
 
+    def _debug_board(self, board):
+        """ Starts a debug overlay frame on a found board """
+        if board and self.debug is not None:
+            self.debug.start(board)
+        return board
+
+    def _debug(self, kind, rectangles):
+        """ Hands (x, y, width, height, label) rectangles on the board to the debug overlay, if there is one """
+        if self.debug is not None:
+            self.debug.annotate(kind, rectangles)
+
+    def _map(self, func, items):
+        """ list(map(func, items)), spread over the recognition workers if there are any """
+        if self.executor is None:
+            return list(map(func, items))
+        return list(self.executor.map(func, items))
+
     @cache_until_refresh
     def get_game_board(self):
         """ Detects the game window area within a computer screen """
+        if self.track_board and self.board_region is not None:
+            board = self._track_game_board()
+            if board:
+                return self._debug_board(board)
 
+            # The board moved or disappeared, look for it on the whole screen again
+            if hasattr(self.source, 'unfocus'):
+                self.source.unfocus()
+                self.source.refresh()
+
+        board = self._find_game_board()
+        self.board_region = (board.x, board.y, board.w, board.h) if board else None
+
+        if board and self.track_board and hasattr(self.source, 'focus'):
+            margin = self.BOARD_MARGIN
+            self.source.focus(board.x - margin, board.y - margin, board.w + 2 * margin, board.h + 2 * margin)
+
+        return self._debug_board(board)
+
+    def _find_game_board(self):
+        """ Contour search for the game window over the whole source image """
         screen_image = self.source.get()
+        (left, top) = self.source.origin
 
-        original_screen_image = screen_image.copy()
         grayscale = cv2.cvtColor(screen_image, cv2.COLOR_BGR2GRAY)
 
         # Find black background around the game screen
@@ -79,9 +251,6 @@ class Vision:
 
         _, contours, _ = cv2.findContours(dilated, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
 
-        Board = namedtuple('Board', ['x', 'y', 'w', 'h', 'screen'])
-
-        # contour_image_target = screen_image.copy()
         for contour in contours:
             # get rectangle bounding contour
             [x, y, w, h] = cv2.boundingRect(contour)
@@ -90,12 +259,77 @@ class Vision:
             if w < 700 or h < 500 or w > 800:
                 continue
 
-            cropped = original_screen_image[y:y+h, x:x+w]
+            cropped = screen_image[y:y+h, x:x+w]
 
-            return Board(x, y, w, h, cropped)
+            return Board(x + left, y + top, w, h, cropped)
 
         return False
 
+    def _track_game_board(self):
+        """ The board at its last known rectangle, or False if it is not there anymore """
+        screen_image = self.source.get()
+        (left, top) = self.source.origin
+        (x, y, w, h) = self.board_region
+
+        if not self._has_black_frame(screen_image, x - left, y - top, w, h):
+            return False
+
+        return Board(x, y, w, h, screen_image[y-top:y-top+h, x-left:x-left+w])
+
+    def _has_black_frame(self, image, x, y, w, h):
+        """
+        Is the rectangle surrounded by black background pixels, while its own
+        edges are not black. Only the 8 one pixel wide strips are checked.
+        """
+        (height, width) = image.shape[:2]
+        if x < 1 or y < 1 or x + w >= width or y + h >= height:
+            return False
+
+        outside = [image[y-1, x:x+w], image[y+h, x:x+w], image[y:y+h, x-1], image[y:y+h, x+w]]
+        inside = [image[y, x:x+w], image[y+h-1, x:x+w], image[y:y+h, x], image[y:y+h, x+w-1]]
+
+        return \
+            all(strip.max() <= 1 for strip in outside) and \
+            all((strip.max(axis=-1) > 1).mean() > 0.5 for strip in inside)
+
+    @cache_until_refresh
+    def get_board_thumbnail(self):
+        """ Board rectangle and its grayscale image averaged over DIFF_BLOCK pixel blocks """
+        board = self.get_game_board()
+        grayscale = cv2.cvtColor(board.screen, cv2.COLOR_BGR2GRAY)
+        size = (board.w // self.DIFF_BLOCK, board.h // self.DIFF_BLOCK)
+
+        return ((board.x, board.y, board.w, board.h), cv2.resize(grayscale, size, interpolation=cv2.INTER_AREA))
+
+    def _changes_since(self, previous):
+        """
+        Grid of blocks which changed since the (thumbnail, results) pair was
+        recorded, or None if the results can not be reused at all.
+        """
+        if not self.diff_frames or previous is None or not self.get_game_board():
+            return None
+
+        (rectangle, thumbnail) = previous[0]
+        (current_rectangle, current_thumbnail) = self.get_board_thumbnail()
+        if rectangle != current_rectangle:
+            return None
+
+        changes = cv2.absdiff(current_thumbnail, thumbnail) > self.DIFF_THRESHOLD
+        if changes.mean() > self.DIFF_MAX_CHANGED:
+            return None
+
+        return changes
+
+    def _region_changed(self, changes, x, y, w, h):
+        """ Did any block overlapping the board region change, regions are widened by a block for rounding """
+        if changes is None:
+            return True
+
+        block = self.DIFF_BLOCK
+        top = max(0, y // block - 1)
+        left = max(0, x // block - 1)
+        return bool(changes[top:(y + h) // block + 2, left:(x + w) // block + 2].any())
+
     @cache_until_refresh
     def get_pieces(self):
         cells = self.get_visible_cells()
@@ -112,7 +346,8 @@ class Vision:
         return list(set(cells) - set(pieces))
 
     @cache_until_refresh
-    def get_visible_cells(self):
+    def get_tile_boxes(self):
+        """ [x, y, w, h] of every tile shaped contour on the board """
         board = self.get_game_board()
 
         grayscale = cv2.cvtColor(board.screen, cv2.COLOR_BGR2GRAY)
@@ -129,87 +364,283 @@ class Vision:
 
         _, contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
+        # [x, y, w, h]
+        bounding_boxes = map(lambda c: list(cv2.boundingRect(c)), contours)
+        return list(filter(lambda b: 30 < b[2] < 50 and 30 < b[3] < 50, bounding_boxes))
+
+    @cache_until_refresh
+    def get_visible_cells(self):
+        board = self.get_game_board()
+
+        changes = self._changes_since(self.previous_cells)
+        if changes is not None and not changes.any():
+            self._debug('cells', self.previous_cells[1])
+            return self.previous_cells[1]
+
         Cell = namedtuple('Cell', ['x', 'y', 'w', 'h', 'content'])
+        candidates = self.get_tile_boxes()
 
-        # [x, y, w, h, img]
-        bounding_boxes = map(lambda c: list(cv2.boundingRect(c)), contours)
-        candidates = filter(lambda b: 30 < b[2] < 50 and 30 < b[3] < 50, bounding_boxes)
-        cells = map(lambda c: Cell(c[0], c[1], c[2], c[3], self._recognize_number(board.screen[c[1]:c[1]+c[3], c[0]:c[0]+c[2]])), candidates)
-        result = list(cells)
+        # Tiles which did not change since the last recognition keep their content
+        known = {(x, y, w, h): content for (x, y, w, h, content) in self.previous_cells[1]} if changes is not None else {}
+        reusable = [tuple(box) in known and not self._region_changed(changes, *box) for box in candidates]
+        numbers = [known[tuple(box)] if reuse else None for (box, reuse) in zip(candidates, reusable)]
+        unknown = [index for (index, reuse) in enumerate(reusable) if not reuse]
 
-        board_original = board.screen.copy()
-        board_dilated = cv2.cvtColor(dilated.copy(), cv2.COLOR_GRAY2BGR)
+        tiles = [board.screen[y:y+h, x:x+w] for (x, y, w, h) in [candidates[index] for index in unknown]]
+        if self.batch_ocr:
+            recognized = self._recognize_numbers(tiles)
+        else:
+            # Tiles are prepared together as one stack, then read one by one
+            recognized = self._map(self._recognize_number_image, self._prepare_number_images(tiles))
+        self._save_ocr_cache()
+        for (index, number) in zip(unknown, recognized):
+            numbers[index] = number
 
-        for (x, y, w, h, cell_image) in result:
-            cv2.rectangle(board_original, (x, y), (x+w, y+h), (0, 0, 255), 2)
-            cv2.rectangle(board_dilated, (x, y), (x+w, y+h), (0, 0, 255), 2)
+        result = [Cell(x, y, w, h, number) for ((x, y, w, h), number) in zip(candidates, numbers)]
+
+        self._debug('cells', result)
+
+        if self.diff_frames:
+            self.previous_cells = (self.get_board_thumbnail(), result)
 
         return result
 
     @cache_until_refresh
     def get_constraints(self):
-        template = os.path.join(self.templates_path, 'target-sum-indicator.png')
-        template = cv2.imread(template)
-        template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-        ret, mask = cv2.threshold(template, 100, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-        template = cv2.bitwise_not(mask)
+        changes = self._changes_since(self.previous_constraints)
+        if changes is not None:
+            (_, (regions, constraints)) = self.previous_constraints
+            margin = self.DIFF_BLOCK * 2
+            # New indicators can only show up within the indicator area, target sums next to them may reach beyond it
+            (left, top, right, bottom) = self.get_indicator_area()
+            if not self._region_changed(changes, left, top, right - left, bottom - top) and \
+                    not any(self._region_changed(changes, x - margin, y - margin, w + 2 * margin, h + 2 * margin) for (_, _, x, y, w, h) in regions):
+                self._debug_target_sums(regions, constraints)
+                return constraints
+
+        constraints = self._find_constraints()
 
-        rotations = [self._rotate(template, angle) for angle in [0, 90, 180, 270]]
+        if self.diff_frames:
+            self.previous_constraints = (self.get_board_thumbnail(), (self.get_target_sum_regions(), constraints))
 
+        return constraints
+
+    def _find_constraints(self):
         board = self.get_game_board()
-        grayscale = cv2.cvtColor(board.screen, cv2.COLOR_BGR2GRAY)
+        regions = self.get_target_sum_regions()
+        constraint_cells = [board.screen[y:y+h, x:x+w] for (_, _, x, y, w, h) in regions]
+
+        if self.batch_ocr:
+            target_sums = self._recognize_target_sums(constraint_cells)
+        else:
+            target_sums = self._map(self._recognize_target_sum_image, self._prepare_target_sum_images(constraint_cells))
+        self._save_ocr_cache()
+
+        constraints = [(dimension, index, int(target_sum)) for ((dimension, index, _, _, _, _), target_sum) in zip(regions, target_sums)]
+        self._debug_target_sums(regions, constraints)
+
+        return constraints
+
+    def _debug_target_sums(self, regions, constraints):
+        self._debug('target sums', [(x, y, w, h, target_sum) for ((_, _, x, y, w, h), (_, _, target_sum)) in zip(regions, constraints)])
+
+    @property
+    def indicator_templates(self):
+        """ Indicator templates, loaded once when target sums are first looked for """
+        if self._indicator_templates is None:
+            self._indicator_templates = self._load_indicator_templates()
+        return self._indicator_templates
+
+    def _load_indicator_templates(self):
+        """
+        Binarized target sum indicator in every direction and scale, as
+        (direction, scale, template) with directions ordered left, top,
+        right, bottom. Raises FileNotFoundError if the template image is
+        missing from templates_path.
+        """
+        path = os.path.join(self.templates_path, 'target-sum-indicator.png')
+        image = cv2.imread(path) if os.path.isfile(path) else None
+        if image is None:
+            raise FileNotFoundError('Target sum indicator template not found at %s, is templates_path set?' % path)
+
+        grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        templates = []
+        for scale in self.indicator_scales:
+            if scale != 1:
+                grayscale_scaled = cv2.resize(grayscale, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                grayscale_scaled = grayscale
+            ret, mask = cv2.threshold(grayscale_scaled, 100, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+            template = cv2.bitwise_not(mask)
+
+            for (direction, angle) in enumerate([0, 90, 180, 270]):
+                templates.append((direction, scale, self._rotate(template, angle)))
+
+        return templates
+
+    @cache_until_refresh
+    def get_target_sum_indicators(self):
+        """
+        Locations of target sum indicators pointing left, top, right and
+        bottom, as (y, x, scale) lists. Only the area around the tiles is
+        searched, and overlapping matches are reduced to the best one.
+        """
+        board = self.get_game_board()
+        (left, top, right, bottom) = self.get_indicator_area()
+        grayscale = cv2.cvtColor(board.screen[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
         ret, mask = cv2.threshold(grayscale, 100, 255, cv2.THRESH_BINARY)
-        grayscale_board = cv2.bitwise_not(mask)
+        grayscale_area = cv2.bitwise_not(mask)
 
-        matches = [self.match_template(grayscale_board, template, 0.8) for template in rotations]
-        [left, top, right, bottom] = matches
-        left = left if left is not None else []
-        top = top if top is not None else []
-        right = right if right is not None else []
-        bottom = bottom if bottom is not None else []
+        matches = [[], [], [], []]
+        for (direction, scale, template) in self.indicator_templates:
+            if template.shape[0] > grayscale_area.shape[0] or template.shape[1] > grayscale_area.shape[1]:
+                continue
 
-        return \
-            [self.parse_target_sums(board, 'row', item, -32, -15, 32, 42) for item in left] + \
-            [self.parse_target_sums(board, 'column', item, -15, -32, 42, 32) for item in top] + \
-            [self.parse_target_sums(board, 'row', item, 8, -15, 32, 42) for item in right] + \
-            [self.parse_target_sums(board, 'column', item, -15, 8, 42, 32) for item in bottom]
+            (scores, ys, xs) = self._match_peaks(grayscale_area, template, 0.8)
+            matches[direction] += [(score, int(y) + top, int(x) + left, scale, template.shape) for (score, y, x) in zip(scores, ys, xs)]
+
+        indicators = [self._suppress_overlapping(direction_matches) for direction_matches in matches]
+        if self.debug is not None:
+            (height, width) = self.indicator_templates[0][2].shape
+            self._debug('indicators', [
+                (x, y, width * scale, height * scale, None) if direction % 2 == 0 else (x, y, height * scale, width * scale, None)
+                for (direction, direction_indicators) in enumerate(indicators)
+                for (y, x, scale) in direction_indicators
+            ])
 
+        return indicators
+
+    @cache_until_refresh
+    def get_indicator_area(self):
+        """ (left, top, right, bottom) of the board area around the tiles, where target sum indicators can be """
+        board = self.get_game_board()
+        boxes = self.get_tile_boxes()
+        if not boxes:
+            return (0, 0, board.w, board.h)
+
+        margin = self.INDICATOR_MARGIN
+        return (
+            max(0, min(x for (x, y, w, h) in boxes) - margin),
+            max(0, min(y for (x, y, w, h) in boxes) - margin),
+            min(board.w, max(x + w for (x, y, w, h) in boxes) + margin),
+            min(board.h, max(y + h for (x, y, w, h) in boxes) + margin),
+        )
+
+    def _suppress_overlapping(self, matches):
+        """
+        Non-maximum suppression across templates: a match is dropped when a
+        better one overlaps it by more than half a template. Matches are
+        compared by their centres, as templates of different scales share
+        no corner. All pairs are compared at once, there are only a handful
+        of peaks per direction.
+        """
+        if not matches:
+            return []
+
+        scores = np.array([m[0] for m in matches])
+        sizes = np.array([m[4] for m in matches])
+        centres = np.array([(m[1], m[2]) for m in matches]) + sizes / 2
+
+        distances = np.abs(centres[:, np.newaxis] - centres[np.newaxis]) * 2
+        overlapping = (distances < np.maximum(sizes[:, np.newaxis], sizes[np.newaxis])).all(axis=2)
+        better = (scores[np.newaxis] > scores[:, np.newaxis]) | \
+            ((scores[np.newaxis] == scores[:, np.newaxis]) & (np.arange(len(matches))[np.newaxis] < np.arange(len(matches))[:, np.newaxis]))
+        suppressed = (overlapping & better).any(axis=1)
+
+        return sorted((y, x, scale) for ((_, y, x, scale, _), dropped) in zip(matches, suppressed) if not dropped)
+
+    @cache_until_refresh
+    def get_target_sum_regions(self):
+        """ (dimension, index, x, y, width, height) of every target sum, in get_constraints order """
+        (left, top, right, bottom) = self.get_target_sum_indicators()
+
+        regions = [
+            self.target_sum_region(orientation, item, *self._scaled(item, offsets))
+            for ((orientation, offsets), items) in zip(self.TARGET_SUM_REGIONS, [left, top, right, bottom])
+            for item in items
+        ]
+
+        # A row or column has a single target sum, however many indicators point at it
+        unique = {}
+        for region in regions:
+            unique.setdefault(region[:2], region)
+
+        return list(unique.values())
+
+    def _scaled(self, item, offsets):
+        """ Target sum region offsets and size for an indicator matched at the item's scale """
+        scale = item[2]
+        return [int(round(offset * scale)) for offset in offsets]
 
     def parse_target_sums(self, board, orientation, cell, x_offset, y_offset, width, height):
+        (dimension, index, x, y, width, height) = self.target_sum_region(orientation, cell, x_offset, y_offset, width, height)
+
+        constraint_cell = board.screen[y:y+height, x:x+width]
+        target_sum = int(self._recognize_target_sum(constraint_cell))
+
+        return (dimension, index, target_sum)
+
+    def target_sum_region(self, orientation, cell, x_offset, y_offset, width, height):
+        """ Returns (dimension, index, x, y, width, height) of the target sum next to a matched indicator """
         x = cell[1] + x_offset
         y = cell[0] + y_offset
         if x < 0: x = 0
         if y < 0: y = 0
 
-        original = board.screen.copy()
-        cv2.rectangle(original, (x, y), (x+width, y+height), (0, 0, 255), 3)
-        constraint_cell = board.screen[y:y+height, x:x+width]
-        target_sum = int(self._recognize_target_sum(constraint_cell))
-
         indexes = (y, x)
         dimension = 0 if orientation == 'row' else 1
         index = indexes[dimension]
 
-        return (dimension, index, target_sum)
+        return (dimension, index, x, y, width, height)
 
     def _rotate(self, img, angle):
         return imutils.rotate_bound(img, angle)
 
     def match_template(self, img_grayscale, template, threshold=0.9):
         """
-        Matches template image in a target grayscaled image
+        Matches template image in a target grayscaled image, returning the
+        (row, column) of the best match in every template sized neighbourhood
         """
+        (scores, ys, xs) = self._match_peaks(img_grayscale, template, threshold)
+        if not len(scores):
+            return None
+        return np.transpose([ys, xs])
 
+    def _match_peaks(self, img_grayscale, template, threshold):
+        """
+        (scores, ys, xs) of template matches above the threshold that are
+        local maxima of the match map, so a match is reported once rather
+        than for every pixel around it
+        """
         res = cv2.matchTemplate(img_grayscale, template, cv2.TM_CCOEFF_NORMED)
-        matches = np.where(res >= threshold)
-        matches = np.transpose(matches)
-        if not np.size(matches):
-            return None
-        return matches
+        (height, width) = template.shape[:2]
+        kernel = np.ones((height // 2 * 2 + 1, width // 2 * 2 + 1), dtype=np.uint8)
+        peaks = (res >= threshold) & (res >= cv2.dilate(res, kernel))
+        (ys, xs) = np.nonzero(peaks)
+
+        return (res[ys, xs], ys, xs)
 
     def _recognize_number(self, candidate_tile_image):
         """ Attempts to OCR the number within a game tile image """
+        return self._recognize_number_image(self._prepare_number_image(candidate_tile_image))
+
+    def _recognize_number_image(self, ocr_image):
+        """ Reads the number of a tile image prepared by _prepare_number_image(s) """
+        return self._classify(ocr_image, 'number', self._tesseract_number)
 
+    def _tesseract_number(self, ocr_image):
+        # Use single-character segmentation mode for Tesseract
+        character = pytesseract.image_to_string(ocr_image, config='--psm 10')
+        try:
+            return int(character)
+        except:
+            return False
+
+    def _recognize_numbers(self, candidate_tile_images):
+        """ Batched _recognize_number, one Tesseract run for all tiles """
+        return self._classify_batch(self._prepare_number_images(candidate_tile_images), 'number')
+
+    def _prepare_number_image(self, candidate_tile_image):
         borderless_image = candidate_tile_image[5:-5, 5:-5]
 
         grayscale = cv2.cvtColor(borderless_image, cv2.COLOR_BGR2GRAY)
@@ -225,14 +656,186 @@ class Vision:
             black_text_on_white_background = cv2.bitwise_not(ocr_image)
             ocr_image = black_text_on_white_background
 
-        # Use single-character segmentation mode for Tesseract
-        character = pytesseract.image_to_string(ocr_image, config='--psm 10')
+        return ocr_image
+
+    def _prepare_number_images(self, candidate_tile_images):
+        """
+        _prepare_number_image for many tiles. Tiles of the same size are
+        stacked into one (N, H, W) array and go through every step together,
+        with Otsu thresholds computed from per-tile histograms. Cheaper than
+        preparing tiles one by one from a handful of tiles on.
+        """
+        ocr_images = [None] * len(candidate_tile_images)
+        for (indexes, tiles) in self._stacks([image[5:-5, 5:-5] for image in candidate_tile_images]):
+            grayscale = self._grayscale(tiles)
+            binary_grayscale = np.where(grayscale > self._otsu_thresholds(grayscale)[:, np.newaxis, np.newaxis], 0, 255).astype(np.uint8)
+
+            # Blur to help text show up better for OCR
+            ocr_stack = self._per_tile(binary_grayscale, 1, 'edge', lambda sheet: cv2.medianBlur(sheet, 3))
+
+            # OCR needs black text on white background
+            ocr_stack = self._black_on_white(ocr_stack)
+            ocr_images = self._unstack(ocr_images, indexes, ocr_stack)
+
+        return ocr_images
+
+    def _stacks(self, images):
+        """ (indexes, (N, H, W, 3) array) of the images grouped by size, into one preallocated array per size """
+        groups = {}
+        for (index, image) in enumerate(images):
+            groups.setdefault(image.shape, []).append(index)
+
+        for (shape, indexes) in groups.items():
+            stack = np.empty((len(indexes),) + shape, dtype=np.uint8)
+            for (slot, index) in enumerate(indexes):
+                stack[slot] = images[index]
+            yield (indexes, stack)
+
+    def _unstack(self, results, indexes, stack):
+        for (slot, index) in enumerate(indexes):
+            results[index] = stack[slot]
+        return results
+
+    def _grayscale(self, stack):
+        """ (N, H, W) grayscale of an (N, H, W, 3) stack, with a single conversion over all tiles """
+        (count, height, width) = stack.shape[:3]
+        return cv2.cvtColor(stack.reshape(count * height, width, 3), cv2.COLOR_BGR2GRAY).reshape(count, height, width)
+
+    def _otsu_thresholds(self, stack):
+        """ Otsu's threshold of every (H, W) tile in a stack, as cv2.THRESH_OTSU picks it """
+        count = stack.shape[0]
+        offsets = (np.arange(count) * 256)[:, np.newaxis]
+        histograms = np.bincount((stack.reshape(count, -1) + offsets).ravel(), minlength=count * 256).reshape(count, 256)
+
+        probabilities = histograms / stack[0].size
+        q1 = np.cumsum(probabilities, axis=1)
+        moments = np.cumsum(probabilities * np.arange(256), axis=1)
+
+        # Between-class variance q1 * q2 * (mu1 - mu2)^2, ignoring splits with an (almost) empty class
+        epsilon = np.finfo(np.float32).eps
+        spread = q1 * (1 - q1)
+        spread[(q1 < epsilon) | (q1 > 1 - epsilon)] = np.inf
+        sigma = (moments - moments[:, -1:] * q1) ** 2 / spread
+
+        return sigma.argmax(axis=1)
+
+    def _per_tile(self, stack, border, mode, operation, scale=1):
+        """
+        Runs an OpenCV filter over all tiles of an (N, H, W) stack at once.
+        Tiles are laid out side by side in one wide image, each padded by
+        `border` columns and rows the way the filter pads image edges, so no
+        tile sees its neighbours. Filters may resize by an integer `scale`.
+        """
+        (count, height, width) = stack.shape
+        padded = np.pad(stack, ((0, 0), (border, border), (border, border)), mode=mode)
+        sheet = np.ascontiguousarray(padded.transpose(1, 0, 2)).reshape(height + 2 * border, -1)
+        result = operation(sheet).reshape((height + 2 * border) * scale, count, (width + 2 * border) * scale).transpose(1, 0, 2)
+        return np.ascontiguousarray(result[:, border * scale:(border + height) * scale, border * scale:(border + width) * scale])
+
+    def _black_on_white(self, stack):
+        """ Inverts the tiles of an (N, H, W) stack whose top left pixel is black """
+        inverted = stack[:, 0, 0] == 0
+        stack[inverted] = 255 - stack[inverted]
+        return stack
+
+    def _recognize_target_sum(self, image):
+        return self._recognize_target_sum_image(self._prepare_target_sum_image(image))
+
+    def _recognize_target_sum_image(self, ocr_image):
+        """ Reads the target sum of an image prepared by _prepare_target_sum_image(s) """
+        return self._classify(ocr_image, 'target_sum', self._tesseract_target_sum)
+
+    def _tesseract_target_sum(self, ocr_image):
+        # Single text line mode
+        number = pytesseract.image_to_string(ocr_image, config='--psm 7')
         try:
-            return int(character)
+            return int(number)
         except:
             return False
 
-    def _recognize_target_sum(self, image):
+    def _recognize_target_sums(self, images):
+        """ Batched _recognize_target_sum, one Tesseract run for all images """
+        return self._classify_batch(self._prepare_target_sum_images(images), 'target_sum')
+
+    def _classify(self, ocr_image, kind, fallback):
+        """ Reads the number with the OCR cache, digit classifier or the fallback OCR, in that order """
+        key = self._ocr_key(kind, ocr_image)
+        number = self.ocr_cache.get(key) if self.ocr_cache is not None else None
+        if number is not None:
+            return number
+
+        if self.digit_classifier is not None:
+            (number, confidence) = self.digit_classifier.read(ocr_image)
+            if not self.digit_classifier.is_confident(confidence):
+                number = None
+
+        if number is None:
+            number = fallback(ocr_image)
+            # Images Tesseract can't read are tried again later rather than remembered as unreadable
+            if number is False:
+                return number
+
+        self._remember([(key, number)])
+
+        return number
+
+    def _classify_batch(self, ocr_images, kind):
+        """ Batched _classify, images missing from the cache which the classifier is unsure about are OCR'd with a single Tesseract run """
+        keys = [self._ocr_key(kind, ocr_image) for ocr_image in ocr_images]
+        numbers = [None] * len(ocr_images)
+        if self.ocr_cache is not None:
+            numbers = [self.ocr_cache.get(key) for key in keys]
+
+        unknown = [index for (index, number) in enumerate(numbers) if number is None]
+        if not unknown:
+            return numbers
+
+        if self.digit_classifier is not None:
+            results = self.digit_classifier.read_all([ocr_images[index] for index in unknown])
+            for (index, (number, confidence)) in zip(unknown, results):
+                if self.digit_classifier.is_confident(confidence):
+                    numbers[index] = number
+
+        unsure = [index for index in unknown if numbers[index] is None]
+        for (index, number) in zip(unsure, self._recognize_batch([ocr_images[index] for index in unsure])):
+            numbers[index] = number
+
+        unreadable = {index for index in unsure if numbers[index] is False}
+        self._remember([(keys[index], numbers[index]) for index in unknown if index not in unreadable])
+        self._save_ocr_cache()
+
+        return numbers
+
+    def _remember(self, entries):
+        """ Stores recognized numbers in the OCR cache, to be written out by _save_ocr_cache """
+        if self.ocr_cache is None or not entries:
+            return
+
+        for (key, number) in entries:
+            self.ocr_cache.put(key, number)
+        self.ocr_cache_unsaved = True
+
+    def _save_ocr_cache(self):
+        """ Writes out the numbers remembered since the last save, once per frame rather than once per tile """
+        if self.ocr_cache is not None and not self.ocr_cache.autosave and self.ocr_cache_unsaved:
+            self.ocr_cache_unsaved = False
+            self.ocr_cache.save()
+
+    def _ocr_key(self, kind, ocr_image):
+        """
+        Content address of a black-on-white OCR image. Only the ink within
+        its bounding box is hashed, so tiles cropped with a slightly different
+        margin share a key.
+        """
+        ink = ocr_image < 128
+        rows = np.flatnonzero(ink.any(axis=1))
+        columns = np.flatnonzero(ink.any(axis=0))
+        ink = ink[rows[0]:rows[-1]+1, columns[0]:columns[-1]+1] if len(rows) else ink[:0, :0]
+
+        digest = hashlib.sha1(np.packbits(ink).tobytes()).hexdigest()
+        return '%s:%dx%d:%s' % (kind, ink.shape[0], ink.shape[1], digest)
+
+    def _prepare_target_sum_image(self, image):
         borderless_image = image
         # Scale up cells to make it easier for tesseract to OCR them
         scaling_factor = 2
@@ -257,10 +860,66 @@ class Vision:
             black_text_on_white_background = cv2.bitwise_not(ocr_image)
             ocr_image = black_text_on_white_background
 
+        return ocr_image
 
-        # Single text line mode
-        number = pytesseract.image_to_string(ocr_image, config='--psm 7')
-        try:
-            return int(number)
-        except:
-            return False
+    def _prepare_target_sum_images(self, images):
+        """ _prepare_target_sum_image for many images, processed in stacks of same sized images """
+        # Scale up cells to make it easier for tesseract to OCR them
+        scaling_factor = 2
+
+        ocr_images = [None] * len(images)
+        for (indexes, cells) in self._stacks(images):
+            grayscale = self._grayscale(cells)
+            binary_grayscale = np.where(grayscale > 150, 0, 255).astype(np.uint8)
+
+            ocr_stack = self._per_tile(binary_grayscale, 1, 'reflect', lambda sheet: cv2.GaussianBlur(sheet, (3, 3), 0))
+            ocr_stack = self._per_tile(ocr_stack, 1, 'edge', lambda sheet: cv2.resize(
+                sheet,
+                (sheet.shape[1] * scaling_factor, sheet.shape[0] * scaling_factor)
+            ), scaling_factor)
+
+            # OCR needs black text on white background
+            ocr_stack = self._black_on_white(ocr_stack)
+            ocr_images = self._unstack(ocr_images, indexes, ocr_stack)
+
+        return ocr_images
+
+    def _recognize_batch(self, ocr_images, padding=20):
+        """
+        OCRs black-on-white images with a single Tesseract run.
+
+        Images are stacked vertically into one sheet, each in its own slot
+        separated by white padding. Recognized words are mapped back to the
+        slot containing their center. Returns an int or False per image.
+        """
+        if not ocr_images:
+            return []
+
+        slot_height = max(image.shape[0] for image in ocr_images) + 2 * padding
+        sheet_width = max(image.shape[1] for image in ocr_images) + 2 * padding
+        sheet = np.full((slot_height * len(ocr_images), sheet_width), 255, dtype=np.uint8)
+        for (slot, image) in enumerate(ocr_images):
+            top = slot * slot_height + padding
+            sheet[top:top+image.shape[0], padding:padding+image.shape[1]] = image
+
+        # Sparse text mode finds every word on the sheet, along with its position
+        data = pytesseract.image_to_data(
+            sheet,
+            config='--psm 11 -c tessedit_char_whitelist=0123456789',
+            output_type=pytesseract.Output.DICT
+        )
+
+        texts = [''] * len(ocr_images)
+        words = sorted(zip(data['left'], data['top'], data['height'], data['text']))
+        for (left, top, height, text) in words:
+            slot = (top + height // 2) // slot_height
+            if text.strip() and 0 <= slot < len(texts):
+                texts[slot] += text.strip()
+
+        def to_number(text):
+            try:
+                return int(text)
+            except:
+                return False
+
+        return [to_number(text) for text in texts]
@@ -1,13 +1,54 @@
+import os
+import sys
+
 from puzbot.vision import ScreenshotSource, Vision
 from puzbot.bot import Bot
 from puzbot.solvers.z3 import Z3Solver
+from puzbot.solvers.cache import CachedSolver
+from puzbot.cache import PersistentCache
 from puzbot.controls import Controller
+from puzbot.digits import DigitClassifier
+from puzbot.pipeline import Pipeline
+from puzbot.debug import DebugOverlay
+from puzbot.instrumentation import Tracer, instrument_bot, format_summary
+from puzbot.profiling import LevelProfiler
 
 source = ScreenshotSource()
-vision = Vision(source, templates_path='templates/')
-solver = Z3Solver()
+vision = Vision(
+    source,
+    templates_path='templates/',
+    digit_classifier=DigitClassifier.load('templates/digits.npz'),
+    ocr_cache=PersistentCache('cache/ocr.json', max_entries=5000, autosave=False),
+    track_board=True,
+    diff_frames=True,
+    # Tiles the classifier is unsure about are read by one Tesseract run per frame
+    batch_ocr=True,
+    workers=os.cpu_count() or 1,
+    # Annotated frames of what was recognized are written to debug/ with --debug
+    debug=DebugOverlay('debug/') if '--debug' in sys.argv else None
+)
+solver = CachedSolver(Z3Solver(), PersistentCache('cache/solutions.json', max_entries=1000), symmetric=True)
 controller = Controller()
-bot = Bot(vision, controller, solver)
+# Every level is profiled into profiles/ with --profile, sampling so the
+# recognition workers and the continuous mode vision thread are included
+profiler = LevelProfiler('profiles/', mode='sampling') if '--profile' in sys.argv else None
+bot = Bot(vision, controller, solver, profiler=profiler)
+# Timings of every stage are written to trace.jsonl with --trace
+tracer = instrument_bot(bot, Tracer('trace.jsonl')) if '--trace' in sys.argv else None
+
+if '--continuous' in sys.argv:
+    # Keep solving levels as they show up, capturing in the background
+    pipeline = Pipeline(vision).start()
+    print('Solving levels continuously, press Ctrl+C to stop')
+    try:
+        bot.run(pipeline)
+    finally:
+        pipeline.stop()
+        if tracer:
+            tracer.close()
+        if profiler:
+            profiler.save()
+    sys.exit()
 
 print('Checking out the game board')
 bot.refresh()
@@ -20,3 +61,10 @@ print('Calculating the solution')
 print('Suggested solution:', bot.get_moves())
 print('Performing the solution')
 bot.do_moves()
+
+if tracer:
+    print(format_summary(tracer.summaries[-1]))
+    tracer.close()
+
+if profiler:
+    profiler.save()
@@ -0,0 +1,12 @@
+"""
+Test doubles shared by several test modules.
+"""
+
+class RecordingController:
+    """ Controller which records drags instead of moving the mouse """
+
+    def __init__(self):
+        self.drags = []
+
+    def left_mouse_drag(self, start, end):
+        self.drags.append((start, end))
@@ -0,0 +1,21 @@
+import unittest
+
+from puzbot.benchmark import MAPS, generate_corpus, run_benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_it_generates_a_reproducible_corpus(self):
+        corpus = generate_corpus(3, seed=1, rows=4, columns=4, prefilled=6)
+
+        self.assertEqual(len(corpus), 3)
+        self.assertEqual(corpus, generate_corpus(3, seed=1, rows=4, columns=4, prefilled=6))
+
+    def test_it_reports_solver_results(self):
+        report = run_benchmark(['backtracking'], {'map-1': MAPS['map-1']}, timeout=10, repeat=2)
+        summary = report['solvers']['backtracking']
+
+        self.assertEqual(summary['runs'], 2)
+        self.assertEqual(summary['solved'], 2)
+        self.assertEqual(summary['timed_out'], 0)
+        self.assertIsNotNone(summary['median_ms'])
+        self.assertIsNotNone(summary['p95_ms'])
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from puzbot.cache import PersistentCache
+
+class TestPersistentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_it_stores_values(self):
+        cache = PersistentCache()
+        cache.put('a', [1, 2])
+
+        self.assertEqual(cache.get('a'), [1, 2])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_it_evicts_least_recently_used_entries(self):
+        cache = PersistentCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_it_persists_entries_in_usage_order(self):
+        cache = PersistentCache(self.path, max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('a', 1)
+
+        reloaded = PersistentCache(self.path, max_entries=2)
+        reloaded.put('c', 3)
+
+        self.assertEqual(reloaded.get('a'), 1)
+        self.assertNotIn('b', reloaded)
+
+    def test_it_saves_only_on_request_without_autosave(self):
+        cache = PersistentCache(self.path, autosave=False)
+        cache.put('a', 1)
+
+        self.assertFalse(os.path.exists(self.path))
+
+        cache.save()
+
+        self.assertEqual(PersistentCache(self.path).get('a'), 1)
+
+    def test_it_can_be_shared_between_threads(self):
+        cache = PersistentCache(self.path, max_entries=50)
+
+        def use(offset):
+            for i in range(200):
+                cache.put('%d-%d' % (offset, i), i)
+                cache.get('%d-%d' % (offset, i // 2))
+
+        threads = [threading.Thread(target=use, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(cache), 50)
+        self.assertEqual(len(PersistentCache(self.path)), 50)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from puzbot.debug import DebugOverlay
+from puzbot.digits import DigitClassifier
+from puzbot.vision import Vision, ImageFileSource
+
+class TestDebugOverlay(unittest.TestCase):
+
+    def vision(self, debug=None):
+        return Vision(
+            ImageFileSource('tests/screenshots/puzlogic-with-sums.png'),
+            templates_path='templates/',
+            digit_classifier=DigitClassifier.load('templates/digits.npz'),
+            debug=debug
+        )
+
+    def test_board_and_tiles_are_views_of_the_frame(self):
+        vision = self.vision()
+        screen = vision.source.get()
+        vision.source.get = lambda: screen
+        board = vision.get_game_board()
+
+        self.assertTrue(np.shares_memory(board.screen, screen))
+        vision.get_visible_cells()
+        vision.get_constraints()
+        self.assertIsNone(vision.debug)
+
+    def test_it_annotates_recognized_cells_and_target_sums(self):
+        overlay = DebugOverlay()
+        vision = self.vision(overlay)
+        cells = vision.get_visible_cells()
+        constraints = vision.get_constraints()
+
+        self.assertEqual(overlay.annotations['cells'], cells)
+        self.assertEqual([label for (_, _, _, _, label) in overlay.annotations['target sums']], [target_sum for (_, _, target_sum) in constraints])
+        self.assertEqual(len(overlay.annotations['indicators']), len(constraints))
+
+        board = vision.get_game_board()
+        image = overlay.finish()
+        self.assertEqual(image.shape, board.screen.shape)
+        self.assertFalse(np.array_equal(image, board.screen))
+
+    def test_it_dumps_annotated_frames_on_refresh(self):
+        with tempfile.TemporaryDirectory() as directory:
+            vision = self.vision(DebugOverlay(directory))
+            for _ in range(2):
+                vision.get_visible_cells()
+                vision.refresh()
+
+            self.assertEqual(sorted(os.listdir(directory)), ['00001.png', '00002.png'])
+            self.assertEqual(cv2.imread(os.path.join(directory, '00001.png')).shape, vision.get_game_board().screen.shape)
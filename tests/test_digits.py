@@ -0,0 +1,115 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from puzbot.digits import DigitClassifier, build, load_labels
+from puzbot.vision import Vision, ImageFileSource
+
+class TestDigitClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = DigitClassifier.load('templates/digits.npz')
+        self.vision = Vision(ImageFileSource('tests/screenshots/single-piece.png'))
+
+    def target_sum_image(self, target_sum):
+        image = cv2.imread('tests/screenshots/constraint_cell_%02d.png' % target_sum)
+        return self.vision._prepare_target_sum_image(image)
+
+    def test_it_recognizes_digit(self):
+        image = self.vision._prepare_number_image(self.vision.source.get())
+
+        (number, confidence) = self.classifier.read(image)
+
+        self.assertEqual(number, 3)
+        self.assertTrue(self.classifier.is_confident(confidence))
+
+    def test_it_recognizes_target_sums(self):
+        targets = [13, 19, 4, 11]
+
+        results = self.classifier.read_all([self.target_sum_image(target) for target in targets])
+
+        self.assertEqual([number for (number, _) in results], targets)
+        self.assertTrue(all(self.classifier.is_confident(confidence) for (_, confidence) in results))
+
+    def test_empty_tile_has_no_number(self):
+        image = np.full((34, 34), 255, dtype=np.uint8)
+        # Background decorations touching the tile edge are not digits
+        cv2.circle(image, (0, 0), 6, 0, -1)
+
+        self.assertEqual(self.classifier.read(image), (False, 1.0))
+
+    def test_it_is_not_confident_about_unknown_glyphs(self):
+        image = np.full((34, 34), 255, dtype=np.uint8)
+        cv2.rectangle(image, (8, 8), (25, 25), 0, -1)
+
+        (_, confidence) = self.classifier.read(image)
+
+        self.assertFalse(self.classifier.is_confident(confidence))
+
+    def test_it_splits_merged_digits(self):
+        image = np.full((40, 60), 255, dtype=np.uint8)
+        cv2.rectangle(image, (10, 10), (24, 29), 0, -1)
+        cv2.rectangle(image, (25, 10), (39, 29), 0, -1)
+
+        self.assertEqual(len(self.classifier.glyphs(image)), 2)
+
+    def test_it_learns_templates(self):
+        classifier = DigitClassifier()
+        classifier.learn([self.target_sum_image(13), self.target_sum_image(19), self.target_sum_image(4)], [13, 19, 4])
+
+        self.assertEqual(sorted(classifier.labels.tolist()), [0, 1, 3, 4, 9])
+        self.assertEqual(classifier.read(self.target_sum_image(13))[0], 13)
+
+    def test_it_saves_and_loads_templates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'digits.npz')
+            self.classifier.save(path)
+            loaded = DigitClassifier.load(path)
+
+        np.testing.assert_array_equal(loaded.templates, self.classifier.templates)
+        np.testing.assert_array_equal(loaded.labels, self.classifier.labels)
+        self.assertEqual(loaded.size, self.classifier.size)
+
+    def test_it_reads_every_labelled_screenshot_confidently(self):
+        for (name, labels) in sorted(load_labels('templates/digits.json').items()):
+            vision = Vision(ImageFileSource(os.path.join('tests/screenshots', name)), templates_path='templates/')
+            board = vision.get_game_board()
+            tiles = {(x, y): number for (x, y, number) in labels['tiles']}
+            target_sums = {(dimension, index): target_sum for (dimension, index, target_sum) in labels['target_sums']}
+
+            boxes = [(x, y, w, h) for (x, y, w, h) in vision.get_tile_boxes() if (x, y) in tiles]
+            regions = [region for region in vision.get_target_sum_regions() if region[:2] in target_sums]
+            self.assertEqual(len(boxes), len(tiles), name)
+            self.assertEqual(len(regions), len(target_sums), name)
+
+            tile_results = self.classifier.read_all([vision._prepare_number_image(board.screen[y:y+h, x:x+w]) for (x, y, w, h) in boxes])
+            target_sum_results = self.classifier.read_all([vision._prepare_target_sum_image(board.screen[y:y+h, x:x+w]) for (_, _, x, y, w, h) in regions])
+
+            for ((x, y, _, _), (number, confidence)) in zip(boxes, tile_results):
+                self.assertEqual(number, tiles[(x, y)], '%s tile at %d, %d' % (name, x, y))
+                self.assertTrue(self.classifier.is_confident(confidence), '%s tile at %d, %d: %.2f' % (name, x, y, confidence))
+            for ((dimension, index, *_), (number, confidence)) in zip(regions, target_sum_results):
+                self.assertEqual(number, target_sums[(dimension, index)], '%s target sum %d, %d' % (name, dimension, index))
+                self.assertTrue(self.classifier.is_confident(confidence), '%s target sum %d, %d: %.2f' % (name, dimension, index, confidence))
+
+    def test_it_builds_the_bank_from_labels(self):
+        classifier = build(sorted(glob.glob('tests/screenshots/*.png')), 'templates/digits.json', 'templates/')
+
+        np.testing.assert_array_equal(classifier.labels, self.classifier.labels)
+        np.testing.assert_allclose(classifier.templates, self.classifier.templates, atol=1e-6)
+
+    def test_bank_covers_the_labelled_digits(self):
+        labels = load_labels('templates/digits.json')
+        tiles = {int(digit) for screenshot in labels.values() for (_, _, number) in screenshot['tiles'] for digit in str(number)}
+        target_sums = {int(digit) for screenshot in labels.values() for (_, _, number) in screenshot['target_sums'] for digit in str(number).zfill(2)}
+        target_sums |= {int(digit) for path in glob.glob('tests/screenshots/constraint_cell_*.png') for digit in os.path.basename(path)[16:18]}
+
+        # Tile templates come first, then target sum ones
+        self.assertEqual(self.classifier.labels.tolist(), sorted(tiles) + sorted(target_sums))
+        # No screenshot shows these yet, Tesseract reads them
+        self.assertEqual(sorted(tiles), [0, 1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(sorted(target_sums), [0, 1, 2, 3, 4, 5, 6, 8, 9])
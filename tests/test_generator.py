@@ -0,0 +1,43 @@
+import random
+import unittest
+
+from puzbot.generator import generate_puzzle
+from puzbot.solvers.backtracking import BacktrackingSolver
+
+class TestGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_it_generates_the_requested_shape(self):
+        puzzle = generate_puzzle(5, 6, 10, constraints=3, rng=self.rng)
+
+        self.assertEqual(len(puzzle.board), 30)
+        self.assertEqual(len([cell for cell in puzzle.board if cell[2] != -1]), 10)
+        self.assertEqual(len(puzzle.pieces), 20)
+        self.assertEqual(len(puzzle.constraints), 3)
+        self.assertTrue(all(row < 5 and column < 6 for (row, column, _) in puzzle.board))
+
+    def test_solution_matches_pieces_and_target_sums(self):
+        puzzle = generate_puzzle(6, 6, 12, constraints=4, density=0.8, rng=self.rng)
+        cells = dict(((row, column), value) for (row, column, value) in puzzle.board + puzzle.solution if value != -1)
+
+        self.assertEqual(sorted(value for (_, _, value) in puzzle.solution), sorted(puzzle.pieces))
+        for (dimension, index, target_sum) in puzzle.constraints:
+            self.assertEqual(sum(value for (cell, value) in cells.items() if cell[dimension] == index), target_sum)
+
+    def test_it_adds_duplicate_pieces(self):
+        puzzle = generate_puzzle(6, 6, 20, duplicates=5, rng=self.rng)
+
+        self.assertGreaterEqual(len(puzzle.pieces) - len(set(puzzle.pieces)), 5)
+
+    def test_generated_puzzles_are_solvable(self):
+        solver = BacktrackingSolver(empty_value=-1)
+        for _ in range(5):
+            puzzle = generate_puzzle(5, 5, 8, duplicates=2, constraints=2, density=0.9, rng=self.rng)
+
+            self.assertNotEqual(solver.solve(puzzle.board, puzzle.pieces, puzzle.constraints), False)
+
+    def test_it_rejects_impossible_prefill(self):
+        with self.assertRaises(ValueError):
+            generate_puzzle(2, 2, 4, rng=self.rng)
@@ -0,0 +1,77 @@
+import unittest
+from collections import namedtuple
+
+from puzbot.bot import Bot
+from puzbot.grid import Grid, cluster
+from puzbot.solvers.backtracking import BacktrackingSolver
+
+from helpers import RecordingController
+
+Cell = namedtuple('Cell', ['x', 'y', 'w', 'h', 'content'])
+
+class FakeVision:
+    def __init__(self, cells, pieces, constraints):
+        self.cells = cells
+        self.pieces = pieces
+        self.constraints = constraints
+
+    def get_game_board(self):
+        return Cell(100, 200, 0, 0, False)
+
+    def get_cells(self):
+        return self.cells
+
+    def get_pieces(self):
+        return self.pieces
+
+    def get_constraints(self):
+        return self.constraints
+
+class TestGrid(unittest.TestCase):
+
+    def setUp(self):
+        # Pixel positions are a pixel or two off between neighbouring cells
+        self.cells = [
+            Cell(162, 38, 44, 44, False),
+            Cell(211, 39, 44, 44, 4),
+            Cell(162, 86, 44, 44, False),
+            Cell(354, 134, 44, 44, False),
+        ]
+
+    def test_it_clusters_positions_within_tolerance(self):
+        self.assertEqual(cluster([38, 86, 39, 134], 12), [38.5, 86, 134])
+
+    def test_it_maps_cells_to_dense_indices(self):
+        grid = Grid(self.cells)
+
+        self.assertEqual(sorted(grid.board()), [(0, 0, -1), (0, 1, 4), (1, 0, -1), (2, 2, -1)])
+        self.assertEqual(grid.cell(0, 1), self.cells[1])
+
+    def test_it_maps_constraints_to_the_nearest_line(self):
+        grid = Grid(self.cells)
+
+        self.assertEqual(grid.constraints([(0, 40, 5), (1, 352, 3), (0, 37, 5), (0, 500, 1)]), [(0, 0, 5), (1, 2, 3)])
+
+    def test_it_rejects_cells_sharing_a_position(self):
+        with self.assertRaises(ValueError):
+            Grid(self.cells + [Cell(165, 41, 30, 30, 2)])
+
+    def test_it_rejects_conflicting_target_sums(self):
+        grid = Grid(self.cells)
+
+        with self.assertRaises(ValueError):
+            grid.constraints([(0, 40, 5), (0, 37, 6)])
+
+class TestBotGrid(unittest.TestCase):
+
+    def test_it_moves_pieces_to_cell_pixels(self):
+        cells = [Cell(162, 38, 44, 44, False), Cell(211, 39, 44, 44, 1)]
+        pieces = [Cell(300, 400, 44, 44, 2)]
+        vision = FakeVision(cells, pieces, [(0, 38, 3)])
+        controller = RecordingController()
+        bot = Bot(vision, controller, BacktrackingSolver(empty_value=-1))
+
+        self.assertEqual(bot.get_constraints(), [(0, 0, 3)])
+        bot.do_moves()
+
+        self.assertEqual(controller.drags, [((422.0, 622.0), (284.0, 260.0))])
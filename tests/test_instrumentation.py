@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+
+from puzbot.bot import Bot
+from puzbot.cache import PersistentCache
+from puzbot.digits import DigitClassifier
+from puzbot.instrumentation import Tracer, instrument_bot, format_summary
+from puzbot.solvers.backtracking import BacktrackingSolver
+from puzbot.vision import Vision, ImageFileSource
+
+from helpers import RecordingController
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trace.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_it_writes_nested_spans_as_json_lines(self):
+        tracer = Tracer(self.path, clock=FakeClock())
+        with tracer.span('outer'):
+            with tracer.span('inner'):
+                pass
+        tracer.close()
+
+        records = self.records()
+        self.assertEqual([(r['name'], r['parent'], r['duration']) for r in records], [('inner', 'outer', 1.0), ('outer', None, 3.0)])
+
+    def test_it_summarizes_levels(self):
+        tracer = Tracer(self.path, clock=FakeClock())
+        hits = [0]
+        tracer.gauge('cache.hits', lambda: hits[0])
+        solve = tracer.wrap('solver.solve', lambda: hits.__setitem__(0, hits[0] + 2), counter='solves')
+        solve()
+        solve()
+
+        summary = tracer.finish_level()
+
+        self.assertEqual(summary['level'], 1)
+        self.assertEqual(summary['spans'], {'solver.solve': {'count': 2, 'total': 2.0, 'max': 1.0}})
+        self.assertEqual(summary['counters'], {'solves': 2, 'cache.hits': 4})
+        self.assertEqual(tracer.finish_level()['counters'], {'cache.hits': 0})
+        tracer.close()
+        self.assertEqual([r['type'] for r in self.records()], ['span', 'span', 'level', 'level'])
+        self.assertIn('solver.solve', format_summary(summary))
+
+class TestInstrumentBot(unittest.TestCase):
+
+    def test_it_times_every_stage_of_a_level(self):
+        vision = Vision(
+            ImageFileSource('tests/screenshots/puzlogic-map-1.png'),
+            templates_path='templates/',
+            digit_classifier=DigitClassifier.load('templates/digits.npz'),
+            ocr_cache=PersistentCache()
+        )
+        bot = Bot(vision, RecordingController(), BacktrackingSolver(empty_value=-1))
+        tracer = instrument_bot(bot, Tracer())
+
+        bot.refresh()
+        bot.do_moves()
+
+        summary = tracer.summaries[-1]
+        self.assertEqual(summary['spans']['controls.left_mouse_drag']['count'], 2)
+        self.assertEqual(summary['spans']['solver.solve']['count'], 1)
+        self.assertEqual(summary['spans']['bot.do_moves']['count'], 1)
+        for name in ['capture.refresh', 'vision.get_game_board', 'vision.get_visible_cells', 'vision.get_constraints']:
+            self.assertIn(name, summary['spans'])
+        # Every tile is looked up in the OCR cache, identical empty tiles hit it
+        self.assertEqual(summary['counters']['ocr_cache.hits'] + summary['counters']['ocr_cache.misses'], 6)
+        self.assertNotIn('ocr.calls', summary['counters'])
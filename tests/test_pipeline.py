@@ -0,0 +1,128 @@
+import threading
+import unittest
+
+from puzbot.bot import Bot
+from puzbot.digits import DigitClassifier
+from puzbot.pipeline import BufferedSource, CaptureThread, FrameBuffer, Pipeline, VisionWorker
+from puzbot.solvers.backtracking import BacktrackingSolver
+from puzbot.vision import Vision, ImageFileSource
+
+from helpers import RecordingController
+
+class TestFrameBuffer(unittest.TestCase):
+
+    def test_it_keeps_the_latest_frames(self):
+        frames = FrameBuffer(size=2)
+        for image in ['a', 'b', 'c']:
+            frames.put(image)
+
+        self.assertEqual([frame.image for frame in frames.frames], ['b', 'c'])
+        self.assertEqual(frames.latest().number, 3)
+
+    def test_it_waits_for_newer_frames(self):
+        frames = FrameBuffer()
+        frames.put('a')
+
+        self.assertIsNone(frames.latest(after=1, timeout=0.01))
+
+        threading.Timer(0.01, frames.put, ['b']).start()
+        self.assertEqual(frames.latest(after=1, timeout=5).image, 'b')
+
+class FailingSource:
+    """ Source whose first `failures` captures raise """
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def capture(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('Screen is locked')
+        return ('frame', (0, 0))
+
+class TestCaptureThread(unittest.TestCase):
+
+    def test_it_keeps_capturing_after_failures(self):
+        frames = FrameBuffer()
+        capture = CaptureThread(FailingSource(2), frames, retry_interval=0.001)
+        capture.start()
+
+        frame = frames.latest(timeout=5)
+        capture.stop()
+        capture.join()
+
+        self.assertEqual(frame.image, 'frame')
+        self.assertEqual(capture.errors, 2)
+        self.assertIsInstance(capture.error, OSError)
+
+    def test_pipeline_raises_capture_errors_when_no_frames_arrive(self):
+        vision = RefreshingVision(FailingSource(float('inf')))
+        pipeline = Pipeline(vision).start()
+
+        try:
+            with self.assertRaises(OSError):
+                pipeline.latest(timeout=0.2)
+        finally:
+            pipeline.stop()
+
+class RefreshingVision:
+    """ Vision which moves its source on to a newer frame while recognizing, as board tracking does """
+
+    def __init__(self, source):
+        self.source = source
+
+    def refresh(self):
+        self.source.refresh()
+
+    def get_game_board(self):
+        self.source.frames.put('newer')
+        self.source.refresh()
+        return False
+
+class TestVisionWorker(unittest.TestCase):
+
+    def test_snapshots_keep_the_frame_recognition_started_on(self):
+        frames = FrameBuffer()
+        frames.put('first')
+        worker = VisionWorker(RefreshingVision(BufferedSource(frames, None, timeout=0)))
+        worker.start()
+
+        snapshot = worker.latest(timeout=5)
+        worker.stop()
+        worker.join()
+
+        self.assertEqual((snapshot.frame.number, snapshot.frame.image), (1, 'first'))
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        source = ImageFileSource('tests/screenshots/puzlogic-map-1.png')
+        self.vision = Vision(source, templates_path='templates/', digit_classifier=DigitClassifier.load('templates/digits.npz'), track_board=True)
+        self.pipeline = Pipeline(self.vision, capture_interval=0.01).start()
+
+    def tearDown(self):
+        self.pipeline.stop()
+
+    def test_it_publishes_snapshots_of_new_frames(self):
+        snapshot = self.pipeline.latest(timeout=5)
+
+        self.assertTrue(snapshot.has_puzzle())
+        self.assertEqual(sorted(piece.content for piece in snapshot.get_pieces()), [1, 2])
+        self.assertEqual(len(snapshot.get_cells()), 4)
+
+        newer_snapshot = self.pipeline.latest(after=snapshot.frame.number, timeout=5)
+        self.assertGreater(newer_snapshot.frame.number, snapshot.frame.number)
+
+    def test_bot_solves_levels_from_snapshots(self):
+        controller = RecordingController()
+        bot = Bot(self.vision, controller, BacktrackingSolver(empty_value=-1))
+
+        self.assertEqual(bot.run(self.pipeline, levels=1, settle_time=0, timeout=5), 1)
+        self.assertEqual(len(controller.drags), 2)
+
+    def test_bot_keeps_its_vision_after_running(self):
+        bot = Bot(self.vision, RecordingController(), BacktrackingSolver(empty_value=-1))
+
+        bot.run(self.pipeline, levels=1, settle_time=0, timeout=5)
+
+        self.assertIs(bot.vision, self.vision)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from puzbot.profiling import LevelProfiler, SamplingProfiler, replay
+from puzbot.solvers.backtracking import BacktrackingSolver
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_it_samples_collapsed_stacks(self):
+        sampler = SamplingProfiler(interval=0.001).start()
+        busy(0.05)
+        sampler.stop()
+
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any('test_profiling.py:busy' in line for line in lines))
+        (stack, count) = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+
+    def test_it_samples_recognition_threads(self):
+        def work_in_threads():
+            other = threading.Thread(target=busy, args=(0.05,), name='other')
+            other.start()
+            with ThreadPoolExecutor(2, thread_name_prefix='recognition') as executor:
+                list(executor.map(busy, [0.05, 0.05]))
+            other.join()
+
+        profiler = LevelProfiler(mode='sampling')
+        profiler.profile(work_in_threads)
+
+        roots = {stack.split(';')[0] for stack in profiler.stacks}
+        self.assertIn('MainThread', roots)
+        self.assertIn('recognition', roots)
+        self.assertNotIn('other', roots)
+        self.assertTrue(any(stack.startswith('recognition;') and stack.endswith('test_profiling.py:busy') for stack in profiler.stacks))
+        # Workers waiting for work are not sampled
+        self.assertFalse(any(stack.endswith('thread.py:_worker') for stack in profiler.stacks))
+
+    def test_it_profiles_bot_levels_replayed_from_screenshots(self):
+        profiler = LevelProfiler(self.directory.name)
+        paths = ['tests/screenshots/puzlogic-map-1.png', 'tests/screenshots/puzlogic-start.png']
+
+        results = replay(paths, BacktrackingSolver(empty_value=-1), profiler)
+        profiler.save()
+
+        self.assertEqual([(path, result) for (path, _, result) in results], [('tests/screenshots/puzlogic-map-1.png', 'solved')])
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['all.prof', 'level-001.prof'])
+        self.assertIn('_recognize_number', profiler.report(focus='_recognize_number'))
+
+    def test_it_reports_sampled_functions(self):
+        profiler = LevelProfiler(self.directory.name, mode='sampling')
+
+        profiler.profile(busy, 0.05)
+        profiler.save()
+
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['all.folded', 'level-001.folded'])
+        self.assertIn('test_profiling.py:busy', profiler.report(focus='busy'))
+
+    def test_it_rejects_unknown_modes(self):
+        with self.assertRaises(ValueError):
+            LevelProfiler(mode='tracing')
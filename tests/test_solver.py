@@ -102,6 +102,22 @@ class TestBruteForceSolver(unittest.TestCase):
             [1, 2]
         )
 
+    def test_line_helpers(self):
+        board = [
+            (0, 0, 1),
+            (0, 1, 0),
+            (1, 0, 2),
+            (1, 1, 3)
+        ]
+
+        self.assertTrue(self.solver.all_unique([1, 2, 3]))
+        self.assertFalse(self.solver.all_unique([1, 2, 1]))
+        self.assertFalse(self.solver.all_cells_filled([1, 0]))
+        self.assertTrue(self.solver.all_cells_filled([2, 3]))
+        self.assertTrue(self.solver.satisfies_constraint(board, (0, 1, 5)))
+        self.assertFalse(self.solver.satisfies_constraint(board, (0, 1, 4)))
+        self.assertTrue(self.solver.satisfies_constraint(board, (0, 0, 2)))
+
     def test_includes_all_legal_moves(self):
         board = [
             (0, 1, 1),
@@ -118,6 +134,21 @@ class TestBruteForceSolver(unittest.TestCase):
         self.assertIn((1, 0, 1), game_moves)
         self.assertIn((1, 1, 2), game_moves)
 
+    def test_legal_moves_respect_constraints(self):
+        board = [
+            (0, 0, 0),
+            (0, 1, 1),
+            (1, 0, 4),
+            (1, 1, 0)
+        ]
+        pieces = [2, 3]
+
+        moves = list(self.solver.legal_moves(board, pieces, [(0, 0, 3)]))
+
+        self.assertEqual([move[0] for move in moves], [(0, 0, 2), (1, 1, 2), (1, 1, 3)])
+        self.assertEqual(moves[0][1:], self.solver.perform_move((0, 0, 2), board, pieces, [(0, 0, 3)]))
+        self.assertEqual(list(self.solver.legal_moves(board, pieces, [(0, 0, 0)])), [])
+
     def test_includes_all_moves(self):
         board = [
             (0, 1, 1),
@@ -200,3 +231,92 @@ class TestBruteForceSolver(unittest.TestCase):
         self.assertIn((2, 4, 4), moves)
         self.assertIn((3, 1, 5), moves)
         self.assertIn((4, 4, 6), moves)
+
+    def test_solve_all_finds_every_solution_once(self):
+        board = [
+            (0, 0, 0),
+            (0, 1, 0),
+            (1, 0, 0),
+            (1, 1, 0)
+        ]
+        pieces = [1, 1, 2, 2]
+
+        solutions = self.solver.solve_all(board, pieces, [])
+
+        self.assertEqual(sorted(solutions), [
+            [(0, 0, 1), (0, 1, 2), (1, 0, 2), (1, 1, 1)],
+            [(0, 0, 2), (0, 1, 1), (1, 0, 1), (1, 1, 2)],
+        ])
+
+    def test_parallel_solution_solves_the_puzzle(self):
+        solver = BruteForceSolver(processes=2)
+        board = [
+            (0, 0, 0),
+            (0, 2, 0),
+            (0, 4, 5),
+            (1, 1, 4),
+            (1, 3, 0),
+            (2, 0, 6),
+            (2, 4, 0),
+            (3, 1, 0),
+            (3, 3, 6),
+            (4, 0, 5),
+            (4, 2, 4),
+            (4, 4, 0),
+        ]
+        pieces = [4, 5, 6, 4, 5, 6]
+
+        moves = set(solver.solve(board, pieces, []))
+
+        self.assertEqual(moves, set([(0, 0, 4), (0, 2, 6), (1, 3, 5), (2, 4, 4), (3, 1, 5), (4, 4, 6)]))
+
+    def test_parallel_solve_all_matches_sequential(self):
+        board = [
+            (0, 0, 0),
+            (0, 1, 0),
+            (0, 2, 0),
+            (1, 0, 0),
+            (1, 1, 0),
+            (1, 2, 0)
+        ]
+        pieces = [1, 2, 3, 1, 2, 3]
+
+        sequential = self.solver.solve_all(board, pieces, [(0, 0, 6)])
+        parallel = BruteForceSolver(processes=2).solve_all(board, pieces, [(0, 0, 6)])
+
+        self.assertEqual(len(sequential), 12)
+        self.assertEqual(sorted(parallel), sorted(sequential))
+
+    def test_parallel_search_counts_worker_nodes(self):
+        board = [(0, column, 0) for column in range(3)] + [(1, column, 0) for column in range(3)]
+        pieces = [1, 2, 3, 1, 2, 3]
+        parallel_solver = BruteForceSolver(processes=2)
+
+        self.solver.solve_all(board, pieces, [(0, 0, 6)])
+        parallel_solver.solve_all(board, pieces, [(0, 0, 6)])
+
+        self.assertGreater(self.solver.nodes, 12)
+        self.assertEqual(parallel_solver.nodes, self.solver.nodes)
+
+    def test_parallel_unsolvable_puzzle_has_no_solution(self):
+        solver = BruteForceSolver(processes=2)
+        board = [
+            (0, 0, 0),
+            (0, 1, 0),
+            (0, 2, 0)
+        ]
+
+        self.assertFalse(solver.solve(board, [1, 1, 2], []))
+
+    def test_it_counts_solutions(self):
+        board = [
+            (0, 0, 0),
+            (0, 1, 0),
+            (1, 0, 0),
+            (1, 1, 0)
+        ]
+        pieces = [1, 1, 2, 2]
+
+        self.assertEqual(self.solver.count_solutions(board, pieces, [], limit=10), 2)
+        self.assertEqual(self.solver.count_solutions(board, pieces, [], limit=1), 1)
+        self.assertEqual(self.solver.count_solutions(board, pieces, [(0, 0, 4)]), 0)
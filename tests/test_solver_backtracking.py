@@ -0,0 +1,134 @@
+import unittest
+
+from puzbot.solvers.backtracking import BacktrackingSolver
+
+class TestBacktrackingSolver(unittest.TestCase):
+
+    def setUp(self):
+        self.solver = BacktrackingSolver()
+
+    def test_it_initializes(self):
+        solver = BacktrackingSolver()
+
+    def test_solution_solves_the_puzzle_first(self):
+        board = [
+            (0, 1, 1),
+            (1, 0, 0),
+            (1, 1, 0),
+            (2, 0, 2)
+        ]
+        pieces = [1, 2]
+
+        moves = self.solver.solve(board, pieces, [])
+
+        self.assertEqual(moves, [(1, 0, 1), (1, 1, 2)])
+
+    def test_solution_solves_the_puzzle_third(self):
+        board = [
+            (0, 0, 0),
+            (0, 2, 0),
+            (0, 4, 5),
+            (1, 1, 4),
+            (1, 3, 0),
+            (2, 0, 6),
+            (2, 4, 0),
+            (3, 1, 0),
+            (3, 3, 6),
+            (4, 0, 5),
+            (4, 2, 4),
+            (4, 4, 0),
+        ]
+        pieces = [4, 5, 6, 4, 5, 6]
+
+        moves = self.solver.solve(board, pieces, [])
+
+        self.assertEqual(len(moves), 6)
+        moves = set(moves)
+        self.assertIn((0, 0, 4), moves)
+        self.assertIn((0, 2, 6), moves)
+        self.assertIn((1, 3, 5), moves)
+        self.assertIn((2, 4, 4), moves)
+        self.assertIn((3, 1, 5), moves)
+        self.assertIn((4, 4, 6), moves)
+
+    def test_solution_solves_the_puzzle_seventh(self):
+        solver = BacktrackingSolver(empty_value=-1)
+        board = [
+            (0, 0, 2),
+            (0, 3, -1),
+            (0, 5, -1),
+            (1, 0, -1),
+            (1, 1, 1),
+            (1, 4, 5),
+            (1, 5, -1),
+            (2, 0, 6),
+            (2, 2, 4),
+            (2, 5, -1),
+            (3, 0, -1),
+            (3, 3, 3),
+            (3, 5, 8),
+            (4, 2, -1),
+            (4, 3, -1),
+            (4, 4, 7)
+        ]
+
+        pieces = [1, 2, 3, 4, 5, 6, 7, 8]
+
+        constraints = [
+            (0, 0, 14),
+            (0, 1, 15),
+            (1, 0, 18),
+            (1, 3, 13),
+            (1, 5, 19)
+        ]
+
+        moves = set(solver.solve(board, pieces, constraints))
+
+        self.assertEqual(moves, set([
+            (0, 3, 8),
+            (0, 5, 4),
+            (1, 0, 3),
+            (1, 5, 6),
+            (2, 5, 1),
+            (3, 0, 7),
+            (4, 2, 5),
+            (4, 3, 2),
+        ]))
+
+    def test_solution_with_zero_value_pieces(self):
+        solver = BacktrackingSolver(empty_value=-1)
+        board = [
+            (0, 1, 1),
+            (1, 0, -1),
+            (1, 1, -1),
+            (2, 0, 2)
+        ]
+        pieces = [0, 2]
+
+        moves = solver.solve(board, pieces, [])
+
+        self.assertEqual(moves, [(1, 0, 0), (1, 1, 2)])
+
+    def test_unsatisfiable_sum_has_no_solution(self):
+        board = [
+            (0, 0, 0),
+            (0, 1, 0),
+        ]
+        pieces = [1, 2]
+
+        self.assertFalse(self.solver.solve(board, pieces, [(0, 0, 4)]))
+
+    def test_prefilled_duplicates_have_no_solution(self):
+        board = [
+            (0, 0, 1),
+            (0, 1, 1),
+            (0, 2, 0),
+        ]
+
+        self.assertFalse(self.solver.solve(board, [2], []))
+
+    def test_duplicate_pieces_are_branched_on_once(self):
+        solver = BacktrackingSolver()
+        state = solver.prepare([(0, 0, 0), (1, 1, 0)], [3, 3], [])
+
+        self.assertEqual(state.candidates(0), [3])
@@ -0,0 +1,71 @@
+import unittest
+
+from puzbot.solvers.board import CompiledBoard, is_solution
+
+class TestCompiledBoard(unittest.TestCase):
+
+    def setUp(self):
+        self.board = CompiledBoard([
+            (0, 1, 1),
+            (1, 0, 0),
+            (1, 1, 0),
+            (2, 0, 2)
+        ], [(1, 1, 3)])
+
+    def test_it_indexes_cells_and_lines(self):
+        self.assertEqual(self.board.free_cells, [1, 2])
+        self.assertEqual(self.board.line_keys[self.board.cell_lines[2][0]], (0, 1))
+        self.assertEqual(self.board.line_keys[self.board.cell_lines[2][1]], (1, 1))
+
+    def test_used_values_are_bitmasks(self):
+        (row, column) = self.board.cell_lines[0]
+        self.assertEqual(self.board.masks[row], 1 << 1)
+        self.assertEqual(self.board.masks[column], 1 << 1)
+
+    def test_it_rejects_negative_values(self):
+        # Boards from Bot mark empty cells with -1
+        with self.assertRaisesRegex(ValueError, 'empty_value'):
+            CompiledBoard([(0, 0, -1), (0, 1, 1)], [], empty_value=0)
+
+        self.assertEqual(CompiledBoard([(0, 0, -1), (0, 1, 1)], [], empty_value=-1).free_cells, [0])
+
+    def test_it_rejects_duplicates(self):
+        self.assertFalse(self.board.can_place(2, 1))
+        self.assertTrue(self.board.can_place(1, 1))
+
+    def test_filled_line_must_match_target_sum(self):
+        self.assertFalse(self.board.can_place(2, 3))
+        self.assertTrue(self.board.can_place(2, 2))
+
+    def test_place_and_unplace_restore_lines(self):
+        (row, column) = self.board.cell_lines[1]
+
+        self.board.place(1, 1)
+        self.assertEqual(self.board.sums[row], 1)
+        self.assertEqual(self.board.free[row], 1)
+        self.assertEqual(self.board.moves(), [(1, 0, 1)])
+
+        self.board.unplace(1)
+        self.assertEqual(self.board.masks[row], 0)
+        self.assertEqual(self.board.masks[column], 1 << 2)
+        self.assertEqual(self.board.sums[row], 0)
+        self.assertEqual(self.board.free[row], 2)
+        self.assertEqual(self.board.moves(), [])
+
+    def test_filled_line_below_target_sum_is_illegal(self):
+        board = CompiledBoard([(0, 0, 1), (0, 1, 2)], [(0, 0, 4)])
+
+        self.assertFalse(board.legal)
+
+    def test_it_checks_solutions(self):
+        board = [
+            (0, 1, 1),
+            (1, 0, -1),
+            (1, 1, -1),
+            (2, 0, 2)
+        ]
+
+        self.assertTrue(is_solution(board, [1, 2], [], [(1, 0, 1), (1, 1, 2)], empty_value=-1))
+        self.assertFalse(is_solution(board, [1, 2], [], [(1, 0, 2), (1, 1, 1)], empty_value=-1))
+        self.assertFalse(is_solution(board, [1, 2], [], [(1, 0, 1)], empty_value=-1))
+        self.assertFalse(is_solution(board, [1, 2], [], False, empty_value=-1))
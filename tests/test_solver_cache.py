@@ -0,0 +1,43 @@
+import unittest
+
+from puzbot.cache import PersistentCache
+from puzbot.solvers.cache import CachedSolver
+
+class CountingSolver:
+    def __init__(self, moves):
+        self.moves = moves
+        self.calls = 0
+
+    def solve(self, board, pieces, constraints=[]):
+        self.calls += 1
+        return self.moves
+
+class TestSolverCache(unittest.TestCase):
+
+    def test_cache_hit_skips_solving(self):
+        inner = CountingSolver([(40, 20, 2)])
+        solver = CachedSolver(inner, PersistentCache())
+
+        self.assertEqual(solver.solve([(10, 20, 1), (40, 20, -1)], [2], []), [(40, 20, 2)])
+        moves = solver.solve([(110, 70, 1), (140, 70, -1)], [2], [])
+
+        self.assertEqual(inner.calls, 1)
+        self.assertEqual(moves, [(140, 70, 2)])
+
+    def test_unsolvable_puzzles_are_not_cached(self):
+        inner = CountingSolver(False)
+        solver = CachedSolver(inner, PersistentCache())
+
+        self.assertFalse(solver.solve([(0, 0, -1)], [1], []))
+        self.assertFalse(solver.solve([(0, 0, -1)], [1], []))
+        self.assertEqual(inner.calls, 2)
+
+    def test_symmetric_cache_hit_maps_solution_onto_transposed_board(self):
+        inner = CountingSolver([(0, 1, 2), (1, 0, 1)])
+        solver = CachedSolver(inner, PersistentCache(), symmetric=True)
+
+        solver.solve([(0, 0, 1), (0, 1, -1), (1, 0, -1)], [1, 2], [(0, 0, 3)])
+        moves = solver.solve([(10, 10, 1), (10, 50, -1), (50, 10, -1)], [1, 2], [(1, 10, 3)])
+
+        self.assertEqual(inner.calls, 1)
+        self.assertEqual(sorted(moves), [(10, 50, 1), (50, 10, 2)])
@@ -0,0 +1,52 @@
+import unittest
+
+from puzbot.solvers.canonical import canonicalize, canonical_form, fingerprint
+
+class TestCanonical(unittest.TestCase):
+
+    def setUp(self):
+        self.board = [
+            (0, 0, 2),
+            (0, 1, -1),
+            (0, 2, -1),
+            (1, 0, -1),
+            (1, 2, 3),
+            (2, 1, -1),
+        ]
+        self.pieces = [1, 3, 1, 2]
+        self.constraints = [(0, 0, 6), (1, 1, 4)]
+
+    def test_canonical_form_ignores_offsets_and_order(self):
+        (first, _) = canonicalize([(10, 20, 1), (40, 20, -1)], [2, 3], [(1, 20, 3)])
+        (second, _) = canonicalize([(140, 70, -1), (110, 70, 1)], [3, 2], [(1, 70, 3)])
+
+        self.assertEqual(first, second)
+        self.assertEqual(fingerprint(first), fingerprint(second))
+
+    def test_canonical_form_distinguishes_pieces(self):
+        (first, _) = canonicalize([(0, 0, -1)], [1], [])
+        (second, _) = canonicalize([(0, 0, -1)], [2], [])
+
+        self.assertNotEqual(fingerprint(first), fingerprint(second))
+
+    def test_permuted_and_transposed_puzzles_share_a_canonical_form(self):
+        # Rows reversed, columns rotated, then transposed and moved to pixel offsets
+        row_map = {0: 2, 1: 1, 2: 0}
+        column_map = {0: 1, 1: 2, 2: 0}
+        board = [(column_map[column] * 40 + 5, row_map[row] * 40 + 7, value) for (row, column, value) in self.board]
+        constraints = [(1, row_map[0] * 40 + 7, 6), (0, column_map[1] * 40 + 5, 4)]
+
+        (first, _) = canonical_form(self.board, self.pieces, self.constraints)
+        (second, _) = canonical_form(board, self.pieces, constraints)
+
+        self.assertEqual(first, second)
+
+    def test_transform_maps_canonical_moves_back(self):
+        board = [(column * 40 + 5, row * 40 + 7, value) for (row, column, value) in self.board]
+        (_, transform) = canonical_form(board, self.pieces, [])
+
+        for (row, column, _) in board:
+            self.assertEqual(transform.to_original(*transform.to_canonical(row, column)), (row, column))
+
+        moves = [(45, 7, 1)]
+        self.assertEqual(transform.moves_to_original(transform.moves_to_canonical(moves)), moves)
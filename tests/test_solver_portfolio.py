@@ -0,0 +1,59 @@
+import time
+import unittest
+
+from puzbot.solvers.backtracking import BacktrackingSolver
+from puzbot.solvers.portfolio import PortfolioSolver
+
+class SlowSolver:
+    def solve(self, board, pieces, constraints=[]):
+        time.sleep(30)
+        return False
+
+class WrongSolver:
+    def solve(self, board, pieces, constraints=[]):
+        return [(row, column, pieces[0]) for (row, column, value) in board if value == -1]
+
+class TestPortfolioSolver(unittest.TestCase):
+
+    def setUp(self):
+        self.board = [
+            (0, 1, 1),
+            (1, 0, -1),
+            (1, 1, -1),
+            (2, 0, 2)
+        ]
+        self.pieces = [1, 2]
+
+    def test_it_solves_with_default_solvers(self):
+        solver = PortfolioSolver()
+
+        moves = solver.solve(self.board, self.pieces, [])
+
+        self.assertEqual(sorted(moves), [(1, 0, 1), (1, 1, 2)])
+        self.assertIsNotNone(solver.winner)
+        self.assertEqual(sum(solver.wins.values()), 1)
+
+    def test_fastest_valid_solution_wins(self):
+        solver = PortfolioSolver([
+            ('slow', SlowSolver()),
+            ('wrong', WrongSolver()),
+            ('backtracking', BacktrackingSolver(empty_value=-1)),
+        ])
+
+        started_at = time.monotonic()
+        moves = solver.solve(self.board, self.pieces, [])
+
+        self.assertLess(time.monotonic() - started_at, 10)
+        self.assertEqual(sorted(moves), [(1, 0, 1), (1, 1, 2)])
+        self.assertEqual(solver.winner, 'backtracking')
+
+    def test_it_gives_up_after_timeout(self):
+        solver = PortfolioSolver([('slow', SlowSolver())], timeout=0.2)
+
+        self.assertFalse(solver.solve(self.board, self.pieces, []))
+        self.assertIsNone(solver.winner)
+
+    def test_unsolvable_puzzle_has_no_solution(self):
+        solver = PortfolioSolver([('backtracking', BacktrackingSolver(empty_value=-1))])
+
+        self.assertFalse(solver.solve(self.board, [1, 1], []))
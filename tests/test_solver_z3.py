@@ -109,3 +109,68 @@ class TestZ3Solver(unittest.TestCase):
         moves = list(self.solver.solve(board, pieces, []))
 
         self.assertEquals(moves, [(1, 0, 0), (1, 1, 2)])
+
+    def test_incremental_solver_reuses_context_for_same_board_shape(self):
+        solver = Z3Solver(incremental=True, encoding=self.solver.encoding)
+        board = [
+            (0, 1, 1),
+            (1, 0, -1),
+            (1, 1, -1),
+            (2, 0, 2)
+        ]
+
+        self.assertEqual(solver.solve(board, [1, 2], []), [(1, 0, 1), (1, 1, 2)])
+
+        board = [
+            (0, 1, 3),
+            (1, 0, -1),
+            (1, 1, -1),
+            (2, 0, -1)
+        ]
+        moves = solver.solve(board, [1, 3, 4], [(0, 1, 5), (1, 1, 7)])
+
+        self.assertEqual(len(solver.contexts), 1)
+        self.assertEqual(set(moves), set([(1, 0, 1), (1, 1, 4), (2, 0, 3)]))
+
+    def test_incremental_solver_forgets_level_constraints(self):
+        solver = Z3Solver(incremental=True, encoding=self.solver.encoding)
+        board = [
+            (0, 0, -1),
+            (0, 1, -1),
+        ]
+
+        self.assertFalse(solver.solve(board, [1, 2], [(0, 0, 4)]))
+        moves = solver.solve(board, [1, 2], [(0, 0, 3)])
+        self.assertEqual(sorted(value for (_, _, value) in moves), [1, 2])
+
+    def test_it_rejects_unknown_encodings(self):
+        with self.assertRaises(ValueError):
+            Z3Solver(encoding='bitvector')
+
+    def test_it_counts_solutions(self):
+        board = [
+            (0, 0, -1),
+            (0, 1, -1),
+            (1, 0, -1),
+            (1, 1, -1)
+        ]
+        pieces = [1, 1, 2, 2]
+
+        self.assertEqual(self.solver.count_solutions(board, pieces, [], limit=10), 2)
+        self.assertEqual(self.solver.count_solutions(board, pieces, [], limit=1), 1)
+        self.assertEqual(self.solver.count_solutions(board, pieces, [(0, 0, 4)]), 0)
+
+    def test_incremental_count_does_not_leak_blocking_clauses(self):
+        solver = Z3Solver(incremental=True, encoding=self.solver.encoding)
+        board = [
+            (0, 0, -1),
+            (0, 1, -1)
+        ]
+
+        self.assertEqual(solver.count_solutions(board, [1, 2], []), 2)
+        self.assertEqual(solver.count_solutions(board, [1, 2], []), 2)
+
+class TestZ3SolverIntegerEncoding(TestZ3Solver):
+
+    def setUp(self):
+        self.solver = Z3Solver(encoding='int')
@@ -1,6 +1,14 @@
+import os
+import tempfile
+import threading
 import unittest
 
-from puzbot.vision import Vision, ImageFileSource
+import cv2
+import numpy as np
+
+from puzbot.cache import PersistentCache
+from puzbot.digits import DigitClassifier
+from puzbot.vision import Vision, ImageFileSource, ScreenshotSource
 
 class TestVision(unittest.TestCase):
 
@@ -65,3 +73,469 @@ class TestVision(unittest.TestCase):
         self.assertEqual(len(found_constraints), 2)
         self.assertIn((0, 38, 4), found_constraints)
         self.assertIn((0, 182, 6), found_constraints)
+
+    def test_it_recognizes_digits_in_batch(self):
+        source = ImageFileSource('tests/screenshots/single-piece.png')
+        vision = Vision(source, batch_ocr=True)
+
+        self.assertEqual(vision._recognize_numbers([source.get(), source.get()]), [3, 3])
+
+    def test_it_recognizes_constraints_in_batch(self):
+        filenames = [
+            'tests/screenshots/constraint_cell_13.png',
+            'tests/screenshots/constraint_cell_19.png',
+            'tests/screenshots/constraint_cell_04.png',
+            'tests/screenshots/constraint_cell_11.png',
+        ]
+        vision = Vision(ImageFileSource(filenames[0]), batch_ocr=True)
+
+        images = [ImageFileSource(filename).get() for filename in filenames]
+        self.assertEqual(vision._recognize_target_sums(images), [13, 19, 4, 11])
+
+    def test_batched_ocr_finds_the_same_constraints(self):
+        source = ImageFileSource('tests/screenshots/puzlogic-map-9.png')
+        vision = Vision(source, templates_path='templates/', batch_ocr=True)
+
+        found_constraints = vision.get_constraints()
+
+        self.assertEqual(len(found_constraints), 2)
+        self.assertIn((0, 38, 4), found_constraints)
+        self.assertIn((0, 182, 6), found_constraints)
+
+    def test_digit_classifier_reads_pieces_and_constraints(self):
+        source = ImageFileSource('tests/screenshots/puzlogic-map-9.png')
+        vision = Vision(source, templates_path='templates/', digit_classifier=DigitClassifier.load('templates/digits.npz'))
+
+        self.assertEqual(sorted(piece.content for piece in vision.get_pieces()), [0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4])
+        self.assertIn((0, 38, 4), vision.get_constraints())
+        self.assertIn((0, 182, 6), vision.get_constraints())
+
+    def test_ocr_cache_answers_known_images(self):
+        source = ImageFileSource('tests/screenshots/single-piece.png')
+        cache = PersistentCache()
+        vision = Vision(source, ocr_cache=cache)
+        cache.put(vision._ocr_key('number', vision._prepare_number_image(source.get())), 7)
+
+        self.assertEqual(vision._recognize_number(source.get()), 7)
+        self.assertEqual(vision._recognize_numbers([source.get()]), [7])
+        self.assertEqual(cache.hits, 2)
+
+    def test_ocr_cache_key_ignores_margins(self):
+        source = ImageFileSource('tests/screenshots/single-piece.png')
+        vision = Vision(source)
+        ocr_image = vision._prepare_number_image(source.get())
+        padded = cv2.copyMakeBorder(ocr_image, 3, 5, 7, 2, cv2.BORDER_CONSTANT, value=255)
+
+        self.assertEqual(vision._ocr_key('number', ocr_image), vision._ocr_key('number', padded))
+        self.assertNotEqual(vision._ocr_key('number', ocr_image), vision._ocr_key('target_sum', ocr_image))
+
+    def test_ocr_cache_persists_recognized_numbers(self):
+        filenames = [
+            'tests/screenshots/constraint_cell_13.png',
+            'tests/screenshots/constraint_cell_19.png',
+            'tests/screenshots/constraint_cell_04.png',
+            'tests/screenshots/constraint_cell_11.png',
+        ]
+        images = [ImageFileSource(filename).get() for filename in filenames]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ocr.json')
+            vision = Vision(
+                ImageFileSource(filenames[0]),
+                digit_classifier=DigitClassifier.load('templates/digits.npz'),
+                ocr_cache=PersistentCache(path, autosave=False)
+            )
+            self.assertEqual(vision._recognize_target_sums(images), [13, 19, 4, 11])
+
+            # Without a classifier only the cache can answer
+            cache = PersistentCache(path)
+            vision = Vision(ImageFileSource(filenames[0]), ocr_cache=cache)
+            self.assertEqual(vision._recognize_target_sums(images), [13, 19, 4, 11])
+            self.assertEqual(vision._recognize_target_sum(images[0]), 13)
+            self.assertEqual((cache.hits, cache.misses), (5, 0))
+
+    def test_ocr_cache_is_written_once_per_frame(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PersistentCache(os.path.join(directory, 'ocr.json'), autosave=False)
+            saves = []
+            save = cache.save
+            cache.save = lambda: saves.append(True) or save()
+            vision = Vision(
+                ImageFileSource('tests/screenshots/puzlogic-map-9.png'),
+                templates_path='templates/',
+                digit_classifier=DigitClassifier.load('templates/digits.npz'),
+                ocr_cache=cache
+            )
+
+            self.assertEqual(len(vision.get_visible_cells()), 30)
+            self.assertEqual(len(vision.get_constraints()), 2)
+            self.assertEqual(len(saves), 2)
+            self.assertEqual(len(PersistentCache(cache.path)), len(cache))
+
+    def test_ocr_cache_does_not_remember_unreadable_images(self):
+        source = ImageFileSource('tests/screenshots/single-piece.png')
+        cache = PersistentCache()
+        vision = Vision(source, ocr_cache=cache)
+        vision._tesseract_number = lambda ocr_image: False
+        vision._recognize_batch = lambda ocr_images: [False] * len(ocr_images)
+
+        self.assertFalse(vision._recognize_number(source.get()))
+        self.assertEqual(vision._recognize_numbers([source.get()]), [False])
+        self.assertEqual(len(cache), 0)
+
+    def test_it_tracks_the_game_board_between_frames(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-map-1.png'), track_board=True)
+        board = vision.get_game_board()
+
+        searches = []
+        find_game_board = vision._find_game_board
+        vision._find_game_board = lambda: searches.append(True) or find_game_board()
+        vision.cache = {}
+        tracked_board = vision.get_game_board()
+
+        self.assertEqual(searches, [])
+        self.assertEqual(tracked_board[:4], board[:4])
+        self.assertEqual(tracked_board.screen.shape, board.screen.shape)
+
+    def test_it_finds_the_game_board_again_once_it_moves(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-map-1.png'), track_board=True)
+        self.assertEqual(vision.get_game_board().y, 255)
+
+        vision.source = ImageFileSource('tests/screenshots/puzlogic-map-7.png')
+        vision.cache = {}
+
+        self.assertEqual(vision.get_game_board().y, 327)
+        self.assertEqual(vision.board_region, (391, 327, 800, 600))
+
+    def test_board_frame_must_be_black(self):
+        image = np.zeros((20, 20, 3), dtype=np.uint8)
+        image[5:15, 5:15] = 200
+
+        self.assertTrue(self.vision._has_black_frame(image, 5, 5, 10, 10))
+        self.assertFalse(self.vision._has_black_frame(image, 4, 5, 10, 10))
+        self.assertFalse(self.vision._has_black_frame(image, 6, 6, 8, 8))
+        self.assertFalse(self.vision._has_black_frame(image, 0, 0, 20, 20))
+
+class FakeScreen:
+    """ Serves regions of a screenshot the way mss does, as BGRA bytes """
+
+    def __init__(self, image):
+        self.image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        self.grabs = []
+
+    def grab(self, monitor):
+        self.grabs.append(monitor)
+        (top, left) = (monitor['top'], monitor['left'])
+        region = self.image[top:top+monitor['height'], left:left+monitor['width']]
+
+        class Shot:
+            raw = bytearray(region.tobytes())
+            (height, width) = region.shape[:2]
+
+        return Shot()
+
+class TestScreenshotSource(unittest.TestCase):
+
+    def setUp(self):
+        self.image = ImageFileSource('tests/screenshots/puzlogic-map-1.png').get()
+        self.source = ScreenshotSource()
+        self.source._screen = FakeScreen(self.image)
+
+    def test_it_captures_bgr_frames(self):
+        frame = self.source.get()
+
+        self.assertEqual(frame.shape, (1080, 1920, 3))
+        np.testing.assert_array_equal(frame, self.image)
+
+    def test_it_captures_focused_region(self):
+        self.source.focus(1900, 1000, 100, 100)
+        frame = self.source.refresh()
+
+        self.assertEqual(self.source.origin, (1900, 1000))
+        np.testing.assert_array_equal(frame, self.image[1000:1080, 1900:1920])
+
+    def test_zero_copy_frames_view_the_captured_buffer(self):
+        self.source.zero_copy = True
+        frame = self.source.get()
+
+        self.assertFalse(frame.flags['OWNDATA'])
+        np.testing.assert_array_equal(frame, self.image)
+
+    def test_frames_keep_the_origin_they_were_captured_at(self):
+        grab = self.source.screen.grab
+        def grab_while_focusing(monitor):
+            # The vision thread focuses on the board while the frame is being grabbed
+            self.source.focus(383, 247, 816, 616)
+            return grab(monitor)
+        self.source.screen.grab = grab_while_focusing
+
+        (frame, origin) = self.source.capture()
+
+        self.assertEqual(origin, (0, 0))
+        self.assertEqual(frame.shape, (1080, 1920, 3))
+
+    def test_it_captures_multiple_regions(self):
+        (first, second) = self.source.grab_regions([(0, 0, 10, 20), (391, 255, 800, 600)])
+
+        np.testing.assert_array_equal(first, self.image[0:20, 0:10])
+        np.testing.assert_array_equal(second, self.image[255:855, 391:1191])
+
+    def test_vision_tracks_the_board_in_a_focused_capture(self):
+        vision = Vision(self.source, track_board=True)
+        board = vision.get_game_board()
+
+        vision.refresh()
+        tracked_board = vision.get_game_board()
+
+        self.assertEqual(self.source.monitor, {'top': 247, 'left': 383, 'width': 816, 'height': 616})
+        self.assertEqual(tracked_board[:4], board[:4])
+        np.testing.assert_array_equal(tracked_board.screen, board.screen)
+
+class FrameListSource:
+    """ Serves the given frames one after another on refresh """
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.origin = (0, 0)
+
+    def get(self):
+        return self.frames[0]
+
+    def refresh(self):
+        if len(self.frames) > 1:
+            self.frames.pop(0)
+        return self.get()
+
+class TestVisionFrameDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = DigitClassifier.load('templates/digits.npz')
+
+    def vision(self, frames):
+        vision = Vision(FrameListSource(frames), templates_path='templates/', digit_classifier=self.classifier, diff_frames=True)
+
+        vision.recognized = []
+        recognize_number = vision._recognize_number_image
+        vision._recognize_number_image = lambda tile: vision.recognized.append(tile.shape) or recognize_number(tile)
+
+        vision.searches = []
+        find_constraints = vision._find_constraints
+        vision._find_constraints = lambda: vision.searches.append(True) or find_constraints()
+
+        return vision
+
+    def test_it_reuses_everything_for_unchanged_frames(self):
+        frame = ImageFileSource('tests/screenshots/puzlogic-with-sums.png').get()
+        vision = self.vision([frame, frame.copy()])
+        cells = vision.get_visible_cells()
+        constraints = vision.get_constraints()
+
+        vision.refresh()
+        vision.recognized = []
+
+        self.assertEqual(vision.get_visible_cells(), cells)
+        self.assertEqual(vision.get_constraints(), constraints)
+        self.assertEqual(vision.recognized, [])
+        self.assertEqual(len(vision.searches), 1)
+
+    def test_it_recognizes_only_changed_tiles(self):
+        frame = ImageFileSource('tests/screenshots/puzlogic-map-1.png').get()
+        vision = self.vision([frame])
+        board = vision.get_game_board()
+        (first, second) = sorted(vision.get_pieces())
+
+        # Swap the two pieces around
+        changed_frame = frame.copy()
+        for (target, piece) in [(first, second), (second, first)]:
+            changed_frame[board.y+target.y:board.y+target.y+target.h, board.x+target.x:board.x+target.x+target.w] = \
+                frame[board.y+piece.y:board.y+piece.y+piece.h, board.x+piece.x:board.x+piece.x+piece.w]
+        vision.source.frames.append(changed_frame)
+
+        vision.refresh()
+        vision.recognized = []
+        pieces = sorted(vision.get_pieces())
+
+        self.assertEqual(len(vision.recognized), 2)
+        self.assertEqual([piece.content for piece in pieces], [second.content, first.content])
+        self.assertEqual(sorted(vision.get_cells()), sorted(Vision(ImageFileSource('tests/screenshots/puzlogic-map-1.png'), digit_classifier=self.classifier).get_cells()))
+
+    def test_it_finds_constraints_again_when_they_change(self):
+        frame = ImageFileSource('tests/screenshots/puzlogic-with-sums.png').get()
+        vision = self.vision([frame])
+        board = vision.get_game_board()
+        vision.get_constraints()
+
+        (_, _, x, y, w, h) = vision.get_target_sum_regions()[0]
+        changed_frame = frame.copy()
+        changed_frame[board.y+y:board.y+y+h, board.x+x:board.x+x+w] = 255
+        vision.source.frames.append(changed_frame)
+        vision.refresh()
+        vision.get_constraints()
+
+        self.assertEqual(len(vision.searches), 2)
+
+    def test_it_finds_target_sums_appearing_on_an_unchanged_board(self):
+        frame = ImageFileSource('tests/screenshots/puzlogic-with-sums.png').get()
+        fresh_vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'), templates_path='templates/', digit_classifier=self.classifier)
+        board = fresh_vision.get_game_board()
+
+        # Paint the target sums and their indicators over with the background
+        blank_frame = frame.copy()
+        shapes = [template.shape for (_, _, template) in fresh_vision.indicator_templates]
+        boxes = [(x, y, w, h) for (_, _, x, y, w, h) in fresh_vision.get_target_sum_regions()]
+        boxes += [(x, y, shapes[direction][1], shapes[direction][0]) for (direction, indicators) in enumerate(fresh_vision.get_target_sum_indicators()) for (y, x, _) in indicators]
+        for (x, y, w, h) in boxes:
+            blank_frame[board.y+y:board.y+y+h, board.x+x:board.x+x+w] = (157, 183, 217)
+
+        vision = self.vision([blank_frame, frame])
+        self.assertEqual(vision.get_constraints(), [])
+
+        vision.refresh()
+        self.assertEqual(vision.get_constraints(), fresh_vision.get_constraints())
+
+class TestVisionIndicators(unittest.TestCase):
+
+    def test_it_loads_indicator_templates_only_when_looking_for_target_sums(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'))
+
+        self.assertTrue(vision.get_tile_boxes())
+        self.assertIsNone(vision._indicator_templates)
+        with self.assertRaisesRegex(FileNotFoundError, 'templates_path'):
+            vision.get_target_sum_indicators()
+
+    def test_it_prepares_rotated_indicator_templates_once(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'), templates_path='templates/', indicator_scales=(1.0, 1.25))
+
+        self.assertEqual([(direction, scale) for (direction, scale, _) in vision.indicator_templates], [
+            (0, 1.0), (1, 1.0), (2, 1.0), (3, 1.0),
+            (0, 1.25), (1, 1.25), (2, 1.25), (3, 1.25),
+        ])
+        self.assertEqual(vision.indicator_templates[0][2].shape, vision.indicator_templates[1][2].shape[::-1])
+
+    def test_it_finds_indicators_with_multiple_scales(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'), templates_path='templates/', indicator_scales=(1.0, 1.25))
+
+        self.assertEqual([len(indicators) for indicators in vision.get_target_sum_indicators()], [1, 0, 1, 1])
+        self.assertEqual(len(vision.get_target_sum_regions()), 3)
+
+    def test_it_searches_for_indicators_only_around_tiles(self):
+        # The level selection menu has indicator-like shapes far from the tiles
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-start-map.png'), templates_path='templates/')
+
+        self.assertEqual(vision.get_target_sum_indicators(), [[], [], [], []])
+
+    def test_overlapping_matches_are_suppressed(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'))
+        matches = [
+            (0.90, 10, 10, 1.0, (13, 8)),
+            (0.95, 11, 12, 1.0, (13, 8)),
+            (0.85, 40, 10, 1.0, (13, 8)),
+        ]
+
+        self.assertEqual(vision._suppress_overlapping(matches), [(11, 12, 1.0), (40, 10, 1.0)])
+
+    def test_match_template_reports_each_match_once(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'))
+        template = np.zeros((9, 9), dtype=np.uint8)
+        cv2.circle(template, (4, 4), 3, 255, -1)
+        image = np.zeros((60, 60), dtype=np.uint8)
+        image[10:19, 10:19] = template
+        image[30:39, 40:49] = template
+
+        self.assertEqual(sorted(vision.match_template(image, template, 0.5).tolist()), [[10, 10], [30, 40]])
+
+    def test_overlapping_matches_of_different_scales_are_suppressed(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'))
+        matches = [
+            (0.85, 10, 10, 1.0, (13, 8)),
+            (0.90, 12, 11, 1.25, (16, 10)),
+            (0.90, 12, 11, 1.25, (16, 10)),
+        ]
+
+        self.assertEqual(vision._suppress_overlapping(matches), [(12, 11, 1.25)])
+
+    def test_matches_of_different_scales_are_compared_by_centre(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'))
+        # The smaller match lies in the bottom right corner of the larger one, their top left corners are far apart
+        matches = [
+            (0.90, 0, 0, 3.0, (40, 24)),
+            (0.85, 27, 16, 1.0, (13, 8)),
+        ]
+
+        self.assertEqual(vision._suppress_overlapping(matches), [(0, 0, 3.0)])
+
+    def test_each_target_sum_is_recognized_once(self):
+        vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'), templates_path='templates/')
+        (left, top, right, bottom) = vision.get_target_sum_indicators()
+        # Indicators on both ends of the same row
+        vision.get_target_sum_indicators = lambda: (left + left, top, right, bottom)
+        recognized = []
+        vision._recognize_target_sum_image = lambda image: recognized.append(image) or 5
+
+        constraints = vision.get_constraints()
+
+        self.assertEqual(len(recognized), 3)
+        self.assertEqual(len(set((dimension, index) for (dimension, index, _) in constraints)), len(constraints))
+
+class TestVisionWorkers(unittest.TestCase):
+
+    def test_workers_recognize_tiles_and_target_sums_in_order(self):
+        classifier = DigitClassifier.load('templates/digits.npz')
+        source = ImageFileSource('tests/screenshots/puzlogic-map-9.png')
+        vision = Vision(source, templates_path='templates/', digit_classifier=classifier)
+        parallel_vision = Vision(source, templates_path='templates/', digit_classifier=classifier, workers=4)
+        threads = set()
+        recognize_number = parallel_vision._recognize_number_image
+        parallel_vision._recognize_number_image = lambda tile: threads.add(threading.current_thread().name) or recognize_number(tile)
+
+        self.assertEqual(parallel_vision.get_visible_cells(), vision.get_visible_cells())
+        self.assertEqual(parallel_vision.get_constraints(), vision.get_constraints())
+        self.assertTrue(all(name.startswith('recognition') for name in threads))
+
+class TestVisionBatchPreparation(unittest.TestCase):
+
+    def setUp(self):
+        self.vision = Vision(ImageFileSource('tests/screenshots/puzlogic-with-sums.png'), templates_path='templates/')
+        self.board = self.vision.get_game_board()
+
+    def crops(self, boxes):
+        return [self.board.screen[y:y+h, x:x+w] for (x, y, w, h) in boxes]
+
+    def assertSameImages(self, images, expected_images):
+        self.assertEqual(len(images), len(expected_images))
+        for (image, expected) in zip(images, expected_images):
+            np.testing.assert_array_equal(image, expected)
+
+    def test_it_prepares_tiles_of_all_sizes_like_one_by_one(self):
+        tiles = self.crops(self.vision.get_tile_boxes())
+        self.assertGreater(len(set(tile.shape for tile in tiles)), 1)
+
+        self.assertSameImages(self.vision._prepare_number_images(tiles), [self.vision._prepare_number_image(tile) for tile in tiles])
+
+    def test_it_prepares_target_sums_like_one_by_one(self):
+        images = self.crops([(x, y, w, h) for (_, _, x, y, w, h) in self.vision.get_target_sum_regions()])
+
+        self.assertSameImages(self.vision._prepare_target_sum_images(images), [self.vision._prepare_target_sum_image(image) for image in images])
+
+    def test_per_tile_recognition_prepares_images_as_stacks(self):
+        vision = Vision(
+            ImageFileSource('tests/screenshots/puzlogic-map-9.png'),
+            templates_path='templates/',
+            digit_classifier=DigitClassifier.load('templates/digits.npz')
+        )
+        def prepare_one(image):
+            raise AssertionError('Prepared a single image')
+        vision._prepare_number_image = prepare_one
+        vision._prepare_target_sum_image = prepare_one
+
+        self.assertEqual(sorted(piece.content for piece in vision.get_pieces()), [0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4])
+        self.assertEqual(sorted(vision.get_constraints()), [(0, 38, 4), (0, 182, 6)])
+
+    def test_it_picks_the_same_otsu_thresholds_as_opencv(self):
+        tiles = np.random.RandomState(1).randint(0, 256, (6, 30, 30)).astype(np.uint8)
+        tiles[0] = 7
+        tiles[1, :, :15] = 40
+
+        expected = [cv2.threshold(tile, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[0] for tile in tiles]
+
+        self.assertEqual(self.vision._otsu_thresholds(tiles).tolist(), expected)